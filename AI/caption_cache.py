@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = os.path.join(os.path.expanduser('~'), '.image_caption', 'captions.db')
+
+
+class CaptionCache:
+    # Captions by key (see CaptionEngine.cache_key) in SQLite. Every hit refreshes the
+    # entry's last use; past max_entries the least recently used tenth is evicted.
+    def __init__(self, path=CACHE_PATH, max_entries=200000):
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._connection = None
+        self.count = 0
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS captions "
+                                     "(key TEXT PRIMARY KEY, caption TEXT NOT NULL, used REAL NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS captions_used ON captions (used)")
+            self.count = self._connection.execute("SELECT COUNT(*) FROM captions").fetchone()[0]
+        return self._connection
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute("SELECT caption FROM captions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute("UPDATE captions SET used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key, caption):
+        with self.lock:
+            added = self.connection.execute("INSERT OR IGNORE INTO captions (key, caption, used) VALUES (?, ?, ?)",
+                                            (key, caption, time.time())).rowcount
+            if not added:
+                self.connection.execute("UPDATE captions SET caption = ?, used = ? WHERE key = ?",
+                                        (caption, time.time(), key))
+            self.count += added
+            if self.count > self.max_entries:
+                keep = self.max_entries * 9 // 10
+                self.connection.execute("DELETE FROM captions WHERE key IN "
+                                        "(SELECT key FROM captions ORDER BY used LIMIT ?)", (self.count - keep,))
+                self.count = keep
+
+    def close(self):
+        with self.lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,178 @@
+import argparse
+import csv
+import glob
+import io
+import itertools
+import json
+import os
+import sys
+import time
+
+from caption_cache import CACHE_PATH, CaptionCache
+from caption_engine import CaptionEngine, IMAGE_EXTENSIONS, MODEL_ID
+
+FIELDS = ["path", "caption", "error"]
+
+
+def find_images(inputs, files_from=None):
+    # Yields image paths lazily: directories are walked recursively in sorted order, globs
+    # are expanded, and plain paths (and lines of files_from) are passed through as given.
+    sources = list(inputs)
+    for source in sources:
+        if os.path.isdir(source):
+            for directory, subdirectories, names in os.walk(source):
+                subdirectories.sort()
+                for name in sorted(names):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(directory, name)
+        elif glob.has_magic(source):
+            for path in sorted(glob.iglob(source, recursive=True)):
+                if os.path.isfile(path):
+                    yield path
+        else:
+            yield source
+    if files_from:
+        f = sys.stdin if files_from == '-' else open(files_from, encoding='utf-8')
+        try:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def unfinished(paths, done):
+    # skips images already in the output, and repeats of one image named twice in the inputs
+    for path in paths:
+        key = os.path.abspath(path)
+        if key not in done:
+            done.add(key)
+            yield path
+
+
+def output_format(path, requested):
+    if requested:
+        return requested
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def finished_paths(path, fmt, retry_errors):
+    # The output file is the checkpoint: every path already written there is done. A last
+    # line cut short by an interrupted run is cut off so appending stays well-formed.
+    done = set()
+    if path == '-' or not os.path.exists(path):
+        return done
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end != len(data):
+            f.truncate(end)
+    # Only b'\n' ends a row: str.splitlines() would also split at U+2028, U+2029 and U+0085,
+    # which JSON leaves unescaped inside strings and which may appear in paths or captions.
+    if fmt == 'csv':
+        rows = csv.DictReader(io.StringIO(data[:end].decode('utf-8'), newline=''))
+    else:
+        rows = (json.loads(line) for line in data[:end].split(b'\n') if line.strip())
+    for row in rows:
+        if retry_errors and row.get('error'):
+            continue
+        done.add(os.path.abspath(row['path']))
+    return done
+
+
+class Writer:
+    def __init__(self, path, fmt, resume):
+        self.stream = sys.stdout if path == '-' else open(path, 'a' if resume else 'w', encoding='utf-8', newline='')
+        self.fmt = fmt
+        self.csv = None
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(self.stream, FIELDS)
+            if self.stream is sys.stdout or self.stream.tell() == 0:
+                self.csv.writeheader()
+
+    def write(self, path, caption, error):
+        row = {'path': path, 'caption': caption, 'error': error}
+        if self.csv:
+            self.csv.writerow(row)
+        else:
+            self.stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        if self.stream is not sys.stdout:
+            self.stream.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Caption images with BLIP without a display")
+    parser.add_argument('inputs', nargs='*', help="image files, directories or glob patterns")
+    parser.add_argument('--files-from', metavar='PATH', help="file with one image path per line, '-' for stdin")
+    parser.add_argument('--output', '-o', default='-', help="JSONL or CSV file to append to, '-' for stdout")
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help="defaults to the output file's extension")
+    parser.add_argument('--overwrite', action='store_true', help="start over instead of resuming the output file")
+    parser.add_argument('--retry-errors', action='store_true', help="when resuming, caption failed images again")
+    parser.add_argument('--model', default=MODEL_ID, help="hub id or local snapshot directory")
+    parser.add_argument('--offline', action='store_true', help="never download; use a local or cached model")
+    parser.add_argument('--safetensors', action='store_true', help="require memory-mapped .safetensors weights")
+    parser.add_argument('--device', help="e.g. cpu or cuda; defaults to cuda when available")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=None, help="decode/preprocess threads")
+    parser.add_argument('--cache', default=CACHE_PATH, metavar='PATH', help="SQLite caption cache")
+    parser.add_argument('--cache-size', type=int, default=200000, help="captions kept in the cache")
+    parser.add_argument('--no-cache', action='store_true', help="always run the model")
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.files_from:
+        parser.error("give at least one input or --files-from")
+
+    fmt = output_format(args.output, args.format)
+    done = set() if args.overwrite else finished_paths(args.output, fmt, args.retry_errors)
+    if done:
+        print(f"resuming, {len(done)} image(s) already captioned", file=sys.stderr)
+    paths = unfinished(find_images(args.inputs, args.files_from), done)
+    first = next(paths, None)
+    if first is None:
+        print("nothing left to caption", file=sys.stderr)
+        return 0
+    paths = itertools.chain([first], paths)
+
+    cache = None if args.no_cache else CaptionCache(args.cache, args.cache_size)
+    engine = CaptionEngine(args.model, args.device, args.batch_size, args.workers, cache=cache,
+                           offline=args.offline, use_safetensors=True if args.safetensors else None)
+    start = time.perf_counter()
+    engine.load()
+    print(f"model loaded on {engine.device} in {time.perf_counter() - start:.1f}s ({engine.describe_timings()})",
+          file=sys.stderr)
+
+    writer = Writer(args.output, fmt, resume=not args.overwrite)
+    count = failed = 0
+    start = time.perf_counter()
+    try:
+        for path, _, result in engine.caption_stream(paths):
+            if isinstance(result, str):
+                writer.write(path, result, '')
+            else:
+                writer.write(path, '', str(result) or type(result).__name__)
+                failed += 1
+            count += 1
+            if count % engine.batch_size == 0:
+                # a batch at a time reaches the disk, so an interrupted run loses at most one
+                writer.flush()
+            if count % 1000 == 0:
+                rate = count / (time.perf_counter() - start)
+                print(f"{count} image(s), {rate:.1f}/s", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("interrupted; run again with the same output to resume", file=sys.stderr)
+        return 130
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    print(f"{count} image(s) in {elapsed:.1f}s, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
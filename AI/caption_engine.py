@@ -0,0 +1,185 @@
+import hashlib
+import importlib.util
+import io
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from PIL import Image
+
+# torch and transformers take seconds to import, so they are only imported by load() and
+# the methods that run after it, never at module import.
+
+MODEL_ID = "Salesforce/blip-image-captioning-base"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class CaptionEngine:
+    # BLIP captioning without any UI, shared by the Tk app and the command line. model_id
+    # may be a hub id or a local directory holding a saved snapshot. A local directory or a
+    # snapshot already in the Hugging Face cache is loaded without touching the network;
+    # only when neither exists is it downloaded, which offline forbids.
+    def __init__(self, model_id=MODEL_ID, device=None, batch_size=8, workers=None, thumbnail_size=None,
+                 max_length=50, num_beams=5, cache=None, offline=False, use_safetensors=None):
+        self.model_id = model_id
+        self.device = device  # None picks cuda when available; a torch.device once loaded
+        self.offline = offline
+        self.use_safetensors = use_safetensors  # True requires .safetensors weights, which are memory-mapped
+        self.batch_size = batch_size  # images per processor call and generate call
+        # decode/preprocess threads; as many batches are prepared ahead of the model
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.thumbnail_size = thumbnail_size  # also hand back a thumbnail of each image when set
+        self.max_length = max_length
+        self.num_beams = num_beams
+        self.cache = cache  # a CaptionCache consulted before the model, or None
+        self.processor = None
+        self.model = None
+        self.lock = threading.Lock()  # one generate at a time, warm-up included
+        self.timings = {}  # seconds per loading phase
+
+    def load(self):
+        self.timings = {}
+        mark = time.perf_counter()
+
+        def lap(phase):
+            nonlocal mark
+            now = time.perf_counter()
+            self.timings[phase] = now - mark
+            mark = now
+
+        if self.offline:
+            os.environ["HF_HUB_OFFLINE"] = "1"
+            os.environ["TRANSFORMERS_OFFLINE"] = "1"
+        import torch
+        from transformers import BlipProcessor, BlipForConditionalGeneration
+        lap("import")
+
+        self.device = torch.device(self.device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.processor, downloaded = self.from_pretrained(BlipProcessor)
+        lap("processor download" if downloaded else "processor")
+        options = {}
+        if self.use_safetensors is not None:
+            options["use_safetensors"] = self.use_safetensors
+        if importlib.util.find_spec("accelerate"):
+            options["low_cpu_mem_usage"] = True  # load weights straight into place, no random init first
+        model, downloaded = self.from_pretrained(BlipForConditionalGeneration, **options)
+        lap("weights download" if downloaded else "weights")
+        self.model = model.to(self.device)
+        lap("device")
+
+    def from_pretrained(self, cls, **options):
+        # Returns the loaded object and whether it had to be downloaded. local_files_only
+        # skips the hub's per-file revalidation requests, which dominate a cached cold start.
+        try:
+            return cls.from_pretrained(self.model_id, local_files_only=True, **options), False
+        except OSError:
+            # neither a local directory nor a cached snapshot
+            if self.offline:
+                raise
+        return cls.from_pretrained(self.model_id, **options), True
+
+    def warm_up(self):
+        # one tiny caption so the first real one does not pay for lazy initialisation
+        start = time.perf_counter()
+        pixel_values = self.processor(images=[Image.new("RGB", (64, 64))], return_tensors="pt")["pixel_values"]
+        self.generate(pixel_values)
+        self.timings["warmup"] = time.perf_counter() - start
+
+    def describe_timings(self):
+        return ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.timings.items())
+
+    def cache_key(self, data):
+        # the same bytes captioned by the same model with the same settings get the same caption
+        digest = hashlib.sha256(data).hexdigest()
+        return f"{digest}|{self.model_id}|{self.max_length}|{self.num_beams}"
+
+    def caption_stream(self, paths):
+        # Yields (path, thumbnail, caption or exception) in input order. Batches are decoded
+        # and preprocessed on a thread pool while the model runs on the batch before them;
+        # at most self.workers batches are held ready, so memory does not grow with the job
+        # and paths may be a lazy iterable.
+        paths = iter(paths)
+        batches = iter(lambda: list(islice(paths, self.batch_size)), [])
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = deque()
+            for batch in batches:
+                pending.append((batch, pool.submit(self.prepare_batch, batch)))
+                if len(pending) == self.workers:
+                    break
+            while pending:
+                batch, future = pending.popleft()
+                thumbnails, results, loaded, pixel_values, keys = future.result()
+                following = next(batches, None)
+                if following:
+                    pending.append((following, pool.submit(self.prepare_batch, following)))
+                if loaded:
+                    try:
+                        for j, caption in zip(loaded, self.generate(pixel_values)):
+                            results[j] = caption
+                    except Exception:
+                        # one bad image should not cost the others their captions
+                        for k, j in enumerate(loaded):
+                            try:
+                                results[j] = self.generate(pixel_values[k:k + 1])[0]
+                            except Exception as e:
+                                results[j] = e
+                if self.cache is not None:
+                    for j in loaded:
+                        if isinstance(results[j], str):
+                            self.cache.put(keys[j], results[j])
+                yield from zip(batch, thumbnails, results)
+
+    def prepare_batch(self, paths):
+        # Read, look up, decode, thumbnail and preprocess on a pool thread. Returns per-image
+        # thumbnails and cached captions or errors, the positions still to run through the
+        # model with their stacked pixel values, and each image's cache key.
+        thumbnails = [None] * len(paths)
+        results = [None] * len(paths)
+        keys = [None] * len(paths)
+        images = []
+        loaded = []
+        for j, path in enumerate(paths):
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                if self.cache is not None:
+                    keys[j] = self.cache_key(data)
+                    results[j] = self.cache.get(keys[j])
+                    if results[j] is not None and not self.thumbnail_size:
+                        continue  # a hit needs no decoding unless the image is shown
+                image = Image.open(io.BytesIO(data)).convert("RGB")
+            except Exception as e:
+                results[j] = e
+                continue
+            if self.thumbnail_size:
+                thumbnail = image.copy()
+                thumbnail.thumbnail(self.thumbnail_size)
+                thumbnails[j] = thumbnail
+            if results[j] is None:
+                images.append(image)
+                loaded.append(j)
+        if not images:
+            return thumbnails, results, loaded, None, keys
+        try:
+            pixel_values = self.processor(images=images, return_tensors="pt")["pixel_values"]
+        except Exception:
+            rows = []
+            for j, image in zip(list(loaded), images):
+                try:
+                    rows.append(self.processor(images=image, return_tensors="pt")["pixel_values"])
+                except Exception as e:
+                    results[j] = e
+                    loaded.remove(j)
+            import torch
+            pixel_values = torch.cat(rows) if rows else None
+        return thumbnails, results, loaded, pixel_values, keys
+
+    def generate(self, pixel_values):
+        import torch
+        with self.lock, torch.inference_mode():
+            output = self.model.generate(pixel_values=pixel_values.to(self.device),
+                                         max_length=self.max_length, num_beams=self.num_beams)
+        return self.processor.batch_decode(output, skip_special_tokens=True)
@@ -1,210 +1,132 @@
-import random
-import datetime
 import webbrowser
 import tkinter as tk
 from tkinter import scrolledtext, END
 import os
-import re
-from difflib import get_close_matches
+import json
+import queue
+import tempfile
 import threading
-import requests
+from array import array
+from collections import deque
+from concurrent.futures import Future
 
-if os.name != 'nt' and 'DISPLAY' not in os.environ:
-    from pyvirtualdisplay import Display
-    display = Display(visible=0, size=(800, 600))
-    display.start()
+from chatbot_engine import ChatSession, ContextManager, refresh_rules
+from chatbot_providers import LOOKUP_FAILED, make_hub
+from chatbot_store import ContextStore
 
-RULES = {
-    "greeting": {
-        "patterns": [r"\b(hi|hello|hey|howdy|greetings|hai|hlo|hii|helo|heyy)\b"],
-        "responses": [
-            "Hey! What's up?",
-            "Hi there! Ready to chat?",
-            "Hello! How can I help you today?"
-        ],
-        "context": None
-    },
-    "goodbye": {
-        "patterns": [r"\b(bye|goodbye|exit|quit|see you|farewell)\b"],
-        "responses": ["Goodbye! Have a great day!", "See you later!", "Bye! Take care!"],
-        "action": "exit"
-    },
-    "how_are_you": {
-        "patterns": [r"\b(how are you|how you doing|how's it going|how do you do|how r u|hows it hangin)\b"],
-        "responses": [
-            "I'm just a bot, but I'm doing awesome! How about you?",
-            "All good here! What's good with you?",
-            "I'm chilling in the digital realm. You?"
-        ],
-        "context": None
-    },
-    "what_are_you_doing": {
-        "patterns": [r"\b(what are you doing|what you doing|whatcha doin|what r u doing|what's up with you)\b"],
-        "responses": [
-            "Just hanging out in the code, ready to answer your questions!",
-            "I'm here, chatting with cool folks like you! What's up?",
-            "Just being a helpful bot. What about you?"
-        ],
-        "context": None
-    },
-    "time": {
-        "patterns": [r"\b(time|what time is it|current time)\b"],
-        "responses": [f"The current time is {datetime.datetime.now().strftime('%H:%M:%S')}."],
-        "context": None
-    },
-    "date": {
-        "patterns": [r"\b(date|today|what day is it|current date)\b"],
-        "responses": [f"Today is {datetime.datetime.now().strftime('%A, %B %d, %Y')}."],
-        "context": None
-    },
-    "name": {
-        "patterns": [r"\b(your name|who are you|what's your name|identify yourself)\b"],
-        "responses": ["I'm CodBot, your friendly assistant!", "Call me CodBot!"],
-        "context": None
-    },
-    "weather": {
-        "patterns": [r"\b(weather|temperature|forecast|is it raining|how's the weather) (?:in )?(.+)\b",
-                     r"\b(weather|temperature|forecast)\b"],
-        "responses": ["Fetching weather for {0}...", "What location should I check?"],
-        "action": "weather_search",
-        "context": "location"
-    },
-    "search": {
-        "patterns": [r"\b(search|look up|find|google) (?:for )?(.+)\b", r"\bsearch\b"],
-        "responses": ["Searching for '{0}'...", "What would you like to search for?"],
-        "action": "search",
-        "context": "query"
-    },
-    "open_browser": {
-        "patterns": [r"\b(open browser|browser|launch browser|open web)\b"],
-        "responses": ["Opening your default browser..."],
-        "action": "open_browser"
-    },
-    "joke": {
-        "patterns": [r"\b(joke|tell me a joke|funny|make me laugh)\b"],
-        "responses": [
-            "Why did the computer go to art school? Because it wanted to learn how to draw a better 'byte'!",
-            "Why can't programmers prefer dark mode? Because the light attracts bugs.",
-            "What do you call a programmer from Finland? Nerdic."
-        ],
-        "context": None
-    },
-    "thanks": {
-        "patterns": [r"\b(thanks|thank you|appreciate it|cheers)\b"],
-        "responses": ["You're welcome!", "Happy to help!", "Anytime!"],
-        "context": None
-    },
-    "fact": {
-        "patterns": [r"\b(fact|fun fact|tell me something|interesting fact)\b"],
-        "responses": [
-            "Honey never spoils! Archaeologists have found pots of honey in ancient Egyptian tombs that are over 3,000 years old and still edible.",
-            "Octopuses have three hearts and can change color to blend into their surroundings.",
-            "Bananas are technically berries, but strawberries aren't!"
-        ],
-        "context": None
-    },
-    "help": {
-        "patterns": [r"\b(help|what can you do|commands|options)\b"],
-        "responses": [
-            "I can help with lots of stuff! Try these commands:",
-            "- Greetings: 'hi', 'hai', 'hlo', 'hello'",
-            "- Ask 'how are you' or 'what are you doing'",
-            "- Check 'time' or 'date'",
-            "- Request a 'joke' or 'fun fact'",
-            "- 'Search [query]' for online searches",
-            "- Check 'weather [location]' for forecasts",
-            "- 'Open browser' to launch web browser",
-            "- Say 'goodbye' to exit"
-        ],
-        "context": None
-    },
-    "personal": {
-        "patterns": [r"\b(my name is|i am|call me) (.+)\b"],
-        "responses": ["Nice to meet you, {name}!", "Hello, {name}!"],
-        "context": "name"
-    },
-    "remember": {
-        "patterns": [r"\b(remember that|note that) (.+)\b"],
-        "responses": ["I'll remember that: '{0}'", "Noted: '{0}'"],
-        "action": "remember",
-        "context": "memory"
-    },
-    "recall": {
-        "patterns": [r"\b(what did I say|recall|remember anything)\b"],
-        "responses": ["You told me: '{0}'", "I remember: '{0}'"],
-        "context": "memory"
-    }
-}
+class ChatHistory:
+    # Every message shown in the chat, as JSON lines in an unnamed temporary file, with the
+    # offset of each kept in memory so any range of messages can be read back.
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.offsets = array('q')
+        self.end = 0
 
-FALLBACKS = [
-    "I didn't quite catch that. Could you rephrase?",
-    "Hmm, not sure what you mean. Try again?",
-    "Sorry, I don't know that one. Type 'help' for commands!",
-    "Did you mean: '{}'? Try again or type 'help'!"
-]
+    def __len__(self):
+        return len(self.offsets)
 
-class ContextManager:
-    def __init__(self):
-        self.context = {
-            "name": None,
-            "location": None,
-            "memory": [],
-            "last_action": None,
-            "conversation_history": []
-        }
+    def extend(self, messages):
+        data = []
+        for message in messages:
+            line = (json.dumps(message) + "\n").encode()
+            self.offsets.append(self.end)
+            self.end += len(line)
+            data.append(line)
+        self.file.seek(0, os.SEEK_END)
+        self.file.write(b"".join(data))
+
+    def read(self, start, stop):
+        if start >= stop:
+            return []
+        end = self.offsets[stop] if stop < len(self.offsets) else self.end
+        self.file.seek(self.offsets[start])
+        return [tuple(json.loads(line)) for line in self.file.read(end - self.offsets[start]).splitlines()]
+
+    def clear(self):
+        self.file.seek(0)
+        self.file.truncate()
+        self.offsets = array('q')
+        self.end = 0
+
+class ChatView:
+    # The transcript on a ScrolledText. Messages added within one event-loop tick go in with
+    # a single insert, and only the newest max_messages stay in the widget. Older ones are
+    # kept in a ChatHistory and paged back in when the view is scrolled to the top.
+    PAGE = 100
+
+    def __init__(self, text, max_messages=500):
+        self.text = text
+        self.max_messages = max_messages
+        self.history = ChatHistory()
+        self.pending = []
+        self.first = 0  # history index of the top message in the widget
+        self.lines = deque()  # text lines taken by each message in the widget
+        self.scheduled = False
+        self.paging = False
+        self.set_scrollbar = text.vbar.set
+        text.configure(yscrollcommand=self.on_scroll)
+
+    def append(self, sender, message, tag):
+        self.pending.append((sender, message, tag))
+        if not self.scheduled:
+            self.scheduled = True
+            self.text.after_idle(self.flush)
+
+    @staticmethod
+    def render(messages):
+        chunks, lines = [], []
+        for sender, message, tag in messages:
+            line = f"{sender}: {message}\n"
+            chunks += [line, tag]
+            lines.append(line.count("\n"))
+        return chunks, lines
+
+    def flush(self):
+        self.scheduled = False
+        messages, self.pending = self.pending, []
+        if not messages:
+            return
+        self.history.extend(messages)
+        chunks, lines = self.render(messages)
+        self.lines.extend(lines)
+        self.text.config(state='normal')
+        self.text.insert(tk.END, *chunks)
+        excess = len(self.lines) - self.max_messages
+        if excess > 0:
+            dropped = sum(self.lines.popleft() for _ in range(excess))
+            self.text.delete("1.0", f"{dropped + 1}.0")
+            self.first += excess
+        self.text.config(state='disabled')
+        self.text.see(tk.END)
 
-    def update(self, key, value):
-        if key == "memory":
-            self.context["memory"].append(value)
-        elif key == "conversation_history":
-            self.context["conversation_history"].append(value)
-            self.context["conversation_history"] = self.context["conversation_history"][-10:]
-        else:
-            self.context[key] = value
-    
-    def get(self, key):
-        return self.context.get(key)
+    def on_scroll(self, top, bottom):
+        self.set_scrollbar(top, bottom)
+        if float(top) <= 0.0 and self.first > 0 and not self.paging:
+            self.paging = True
+            self.text.after_idle(self.page_in)
 
-def match_rule(user_input, context_manager):
-    user_input = user_input.lower().strip()
-    
-    for intent, data in RULES.items():
-        for pattern in data["patterns"]:
-            match = re.search(pattern, user_input)
-            if match:
-                groups = match.groups()
-                context = data.get("context")
-                
-                if context and groups:
-                    if context == "name" and len(groups) > 1:
-                        context_manager.update("name", groups[1])
-                    elif context == "location" and len(groups) > 1:
-                        context_manager.update("location", groups[1])
-                    elif context == "memory" and len(groups) > 1:
-                        context_manager.update("memory", groups[1])
-                
-                context_manager.update("conversation_history", {"input": user_input, "intent": intent})
-                return intent, data, groups
-    
-    all_patterns = []
-    for intent, data in RULES.items():
-        for pattern in data["patterns"]:
-            words = re.findall(r'\b\w+\b', pattern)
-            all_patterns.extend([(word, intent) for word in words])
-    
-    words = re.findall(r'\b\w+\b', user_input)
-    for word in words:
-        matches = get_close_matches(word, [p[0] for p in all_patterns], n=1, cutoff=0.7)
-        if matches:
-            matched_word = matches[0]
-            intent = next((p[1] for p in all_patterns if p[0] == matched_word), None)
-            if intent:
-                data = RULES[intent]
-                context_manager.update("conversation_history", {"input": user_input, "intent": intent})
-                return intent, data, []
+    def page_in(self):
+        self.paging = False
+        start = max(0, self.first - self.PAGE)
+        chunks, lines = self.render(self.history.read(start, self.first))
+        if not chunks:
+            return
+        self.text.config(state='normal')
+        self.text.insert("1.0", *chunks)
+        self.text.config(state='disabled')
+        self.lines.extendleft(reversed(lines))
+        self.first = start
+        # keep the message that was at the top where it was
+        self.text.yview(f"{sum(lines) + 1}.0")
 
-    context_manager.update("conversation_history", {"input": user_input, "intent": "general"})
-    return None, None, [random.choice(FALLBACKS)]
+    def clear(self):
+        self.pending = []
+        self.history.clear()
+        self.lines.clear()
+        self.first = 0
+        self.text.config(state='normal')
+        self.text.delete(1.0, tk.END)
+        self.text.config(state='disabled')
 
 class CodBotGUI:
     def __init__(self, root):
@@ -229,6 +151,7 @@ class CodBotGUI:
         self.chat_area.tag_config("bot", foreground="#0066cc")
         self.chat_area.tag_config("user", foreground="#333333")
         self.chat_area.tag_config("error", foreground="#ff0000")
+        self.chat_view = ChatView(self.chat_area)
         self.append_message("CodBot", "Hey! I'm CodBot, ready to chat. Say 'hai', 'hlo', or type 'help' for commands!", "bot")
         self.chat_area.config(state='disabled')
 
@@ -255,21 +178,21 @@ class CodBotGUI:
         )
         self.clear_button.pack(pady=5)
 
-        self.context_manager = ContextManager()
-        self.pending_action = None
+        # CODBOT_PROVIDERS=http answers weather and search from the web instead of canned text
+        # name, memory and recent history carry over between runs
+        context_manager = ContextManager("local", ContextStore())
+        self.session = ChatSession(context_manager, make_hub(os.environ.get("CODBOT_PROVIDERS", "canned")))
+        self.context_manager = self.session.context_manager
+        self.replies = queue.Queue()  # provider answers finished off the Tk thread
+        self.waiting = 0
+        self.root.after(2000, self.watch_rules)
 
     def append_message(self, sender, message, tag=None):
-        self.chat_area.config(state='normal')
-        tag = tag or sender.lower()
-        self.chat_area.insert(tk.END, f"{sender}: {message}\n", tag)
-        self.chat_area.config(state='disabled')
-        self.chat_area.see(tk.END)
+        self.chat_view.append(sender, message, tag or sender.lower())
 
     def clear_chat(self):
-        self.chat_area.config(state='normal')
-        self.chat_area.delete(1.0, tk.END)
+        self.chat_view.clear()
         self.append_message("CodBot", "Chat cleared. Say 'hai' or 'hlo' to start again!", "bot")
-        self.chat_area.config(state='disabled')
 
     def process_input(self, event=None):
         user_input = self.input_field.get().strip()
@@ -279,93 +202,52 @@ class CodBotGUI:
         self.append_message("You", user_input, "user")
         self.input_field.delete(0, tk.END)
 
-        if self.pending_action:
-            self.handle_pending_action(user_input)
-            return
-        intent, data, extras = match_rule(user_input, self.context_manager)
-        if not intent:
-            if is_question(user_input):
-                self.append_message("CodBot", "Let me think about that... [Grok 3 would answer here]", "bot")
-            else:
-                self.append_message("CodBot", extras[0], "error")
-            return
-
-        response = random.choice(data["responses"])
-        action = data.get("action")
-        
-        if extras:
-            try:
-                response = response.format(*extras)
-            except (IndexError, TypeError):
-                try:
-                    response = response.format(extras[0] if extras else "")
-                except:
-                    pass
-        
-        if "{name}" in response and self.context_manager.get("name"):
-            response = response.format(name=self.context_manager.get("name"))
-        
-        self.append_message("CodBot", response, "bot")
+        messages, action = self.session.respond(user_input)
+        for message, tag in messages:
+            if isinstance(message, Future):
+                if not message.done():
+                    # Tk may only be touched from its own thread, so the answer is queued and polled for
+                    message.add_done_callback(lambda future, tag=tag: self.replies.put((future, tag)))
+                    self.waiting += 1
+                    if self.waiting == 1:
+                        self.root.after(50, self.poll_replies)
+                    continue
+                message = message.result()
+            self.append_message("CodBot", message, tag)
         
         if action == "exit":
             self.root.after(1000, self.root.quit)
         elif action == "open_browser":
             threading.Thread(target=webbrowser.open, args=("https://www.google.com",), daemon=True).start()
-        elif action == "weather_search":
-            self.handle_weather_search(extras)
-        elif action == "search":
-            self.handle_search(extras)
-        elif action == "remember":
-            if extras and len(extras) > 1:
-                self.context_manager.update("memory", extras[1])
 
-    def handle_weather_search(self, extras):
-        location = None
-        
-        if extras and len(extras) > 1:
-            location = extras[1]
-        
-        if not location:
-            self.pending_action = "weather"
-            self.append_message("CodBot", "What location should I check?", "bot")
-            return
-        
-        weather_info = f"The weather in {location} is sunny with a temperature of 25°C."
-        self.append_message("CodBot", weather_info, "bot")
+    def watch_rules(self):
+        # picks up edits to chatbot_rules.json without restarting or losing the conversation
+        refresh_rules()
+        self.root.after(2000, self.watch_rules)
 
-    def handle_search(self, extras):
-        query = None
-        
-        if extras and len(extras) > 1:
-            query = extras[1]
-        
-        if not query:
-            self.pending_action = "search"
-            self.append_message("CodBot", "What would you like to search for?", "bot")
-            return
-        
-        search_result = f"Search results for '{query}': [Grok 3 would fetch real-time data here]"
-        self.append_message("CodBot", search_result, "bot")
-
-    def handle_pending_action(self, user_input):
-        if user_input.lower() in ['cancel', 'nevermind']:
-            self.append_message("CodBot", "Action cancelled.", "bot")
-            self.pending_action = None
-            return
-            
-        if self.pending_action == "weather":
-            weather_info = f"The weather in {user_input} is sunny with a temperature of 25°C."
-            self.append_message("CodBot", weather_info, "bot")
-        elif self.pending_action == "search":
-            search_result = f"Search results for '{user_input}': [Grok 3 would fetch real-time data here]"
-            self.append_message("CodBot", search_result, "bot")
-        
-        self.pending_action = None
-
-def is_question(text):
-    return text.strip().endswith('?')
+    def poll_replies(self):
+        try:
+            while True:
+                try:
+                    future, tag = self.replies.get_nowait()
+                except queue.Empty:
+                    break
+                self.waiting -= 1
+                try:
+                    text = future.result()
+                except Exception:
+                    text = LOOKUP_FAILED
+                self.append_message("CodBot", text, tag)
+        finally:
+            # keep polling even if showing one reply failed, or later ones would never appear
+            if self.waiting:
+                self.root.after(50, self.poll_replies)
 
 if __name__ == "__main__":
+    if os.name != 'nt' and 'DISPLAY' not in os.environ:
+        from pyvirtualdisplay import Display
+        display = Display(visible=0, size=(800, 600))
+        display.start()
     try:
         root = tk.Tk()
         app = CodBotGUI(root)
@@ -0,0 +1,165 @@
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from chatbot_engine import ChatSession, resolve
+from chatbot_providers import make_hub
+
+# Replays transcripts through the engine. Each input line is either plain text, all of it
+# one session, or a JSON object {"text": ..., "session": ..., "intent": ...} where intent
+# is the expected label to score against. Each output line is
+# {"session", "text", "intent", "groups", "responses", "action"} plus "expected" when given.
+# With several workers, sessions are sharded across processes by id: each session's
+# messages stay in order, but output from different sessions interleaves.
+
+CHUNK = 256  # messages per hand-off between processes
+MAX_SESSIONS = 10000  # sessions kept live per process, least recently used dropped first
+
+
+def parse_line(line):
+    line = line.rstrip('\r\n')
+    if line.startswith('{'):
+        try:
+            message = json.loads(line)
+        except ValueError:
+            message = None
+        if isinstance(message, dict) and isinstance(message.get('text'), str):
+            return str(message.get('session', 'default')), message['text'], message.get('intent')
+    return 'default', line, None
+
+
+class Replayer:
+    def __init__(self):
+        self.providers = make_hub()  # canned answers; a replay never goes to the network
+        self.sessions = OrderedDict()
+        self.messages = 0
+        self.labelled = 0
+        self.correct = 0
+
+    def session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = ChatSession(providers=self.providers)
+            if len(self.sessions) > MAX_SESSIONS:
+                self.sessions.popitem(last=False)
+        else:
+            self.sessions.move_to_end(session_id)
+        return session
+
+    def replay(self, session_id, text, expected):
+        session = self.session(session_id)
+        messages, action = session.respond(text)
+        intent, groups = session.last_match
+        self.messages += 1
+        record = {
+            'session': session_id,
+            'text': text,
+            'intent': intent,
+            'groups': list(groups),
+            'responses': [message for message, _ in resolve(messages)],
+            'action': action,
+        }
+        if expected is not None:
+            record['expected'] = expected
+            self.labelled += 1
+            self.correct += intent == expected
+        return json.dumps(record, ensure_ascii=False)
+
+    def counts(self):
+        return self.messages, self.labelled, self.correct
+
+
+def _worker(inbox, outbox, seed):
+    random.seed(seed)
+    replayer = Replayer()
+    while True:
+        chunk = inbox.get()
+        if chunk is None:
+            break
+        outbox.put([replayer.replay(*message) for message in chunk])
+    outbox.put(replayer.counts())
+
+
+def replay_parallel(lines, out, workers, seed):
+    inboxes = [multiprocessing.Queue(maxsize=8) for _ in range(workers)]
+    outbox = multiprocessing.Queue(maxsize=8 * workers)
+    processes = [multiprocessing.Process(target=_worker, args=(inbox, outbox, seed + number), daemon=True)
+                 for number, inbox in enumerate(inboxes)]
+    for process in processes:
+        process.start()
+
+    totals = [0, 0, 0]
+
+    def drain():
+        finished = 0
+        while finished < workers:
+            item = outbox.get()
+            if isinstance(item, tuple):
+                finished += 1
+                for number, count in enumerate(item):
+                    totals[number] += count
+            else:
+                out.write('\n'.join(item) + '\n')
+
+    writer = threading.Thread(target=drain)
+    writer.start()
+    chunks = [[] for _ in range(workers)]
+    for line in lines:
+        message = parse_line(line)
+        shard = zlib.crc32(message[0].encode()) % workers
+        chunks[shard].append(message)
+        if len(chunks[shard]) >= CHUNK:
+            inboxes[shard].put(chunks[shard])
+            chunks[shard] = []
+    for chunk, inbox in zip(chunks, inboxes):
+        if chunk:
+            inbox.put(chunk)
+        inbox.put(None)
+    writer.join()
+    for process in processes:
+        process.join()
+    return tuple(totals)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay chat transcripts through CodBot's engine as JSONL")
+    parser.add_argument('input', nargs='?', default='-', help="transcript file, '-' for stdin")
+    parser.add_argument('--output', '-o', default='-', help="JSONL file to write, '-' for stdout")
+    parser.add_argument('--workers', type=int, default=1, help="processes to shard sessions across")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the choice between responses")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    start = time.perf_counter()
+    try:
+        lines = (line for line in source if line.strip())
+        if args.workers <= 1:
+            random.seed(args.seed)
+            replayer = Replayer()
+            for line in lines:
+                out.write(replayer.replay(*parse_line(line)) + '\n')
+            messages, labelled, correct = replayer.counts()
+        else:
+            messages, labelled, correct = replay_parallel(lines, out, args.workers, args.seed)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"{messages} messages in {elapsed:.2f}s ({messages / max(elapsed, 1e-9):.0f}/s)", file=sys.stderr)
+    if labelled:
+        print(f"intent accuracy {correct / labelled:.2%} ({correct}/{labelled} labelled)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
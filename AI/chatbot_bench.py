@@ -0,0 +1,124 @@
+import argparse
+import json
+import random
+import string
+import sys
+import time
+from collections import defaultdict
+
+from chatbot_batch import parse_line
+from chatbot_engine import ChatSession, RULES
+from chatbot_providers import make_hub
+
+# Messages that reach each branch of match_rule: a regex hit per intent, misspellings that
+# only the fuzzy fallback catches, and text that falls all the way through.
+SAMPLES = [
+    "hi", "hello there", "bye", "how are you", "what are you doing", "what time is it",
+    "what's the date today", "what's your name", "weather in london", "forecast",
+    "search for python generators", "open browser", "tell me a joke", "thanks a lot",
+    "tell me a fun fact", "help", "my name is sam", "remember that the meeting is at noon",
+    "recall", "helo", "jokee", "temprature", "thnks", "brwser",
+    "the quick brown fox jumps over the lazy dog", "asdf qwer zxcv", "is this thing on?",
+]
+STAGES = ["regex", "fuzzy", "context", "format", "providers"]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def noise(rng, count):
+    # random words, mostly unmatched, so the fuzzy path sees cache misses too
+    for _ in range(count):
+        words = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9)))
+                 for _ in range(rng.randint(1, 6))]
+        yield ' '.join(words)
+
+
+def run(messages, sessions):
+    traces = []
+    hub = make_hub()
+    pool = [ChatSession(providers=hub) for _ in range(sessions)]
+    for session in pool:
+        session.trace_hook = traces.append
+    for number, text in enumerate(messages):
+        pool[number % sessions].respond(text)
+    return traces
+
+
+def summarise(traces):
+    by_intent = defaultdict(list)
+    for trace in traces:
+        by_intent[trace.intent].append(trace)
+        by_intent['all'].append(trace)
+    report = {}
+    for intent, group in sorted(by_intent.items()):
+        totals = [trace.total for trace in group]
+        row = {
+            'messages': len(group),
+            'p50_us': round(percentile(totals, 0.50) * 1e6, 2),
+            'p99_us': round(percentile(totals, 0.99) * 1e6, 2),
+            'stages': {},
+        }
+        for stage in STAGES:
+            times = [trace.stages[stage] for trace in group if stage in trace.stages]
+            if times:
+                row['stages'][stage] = {
+                    'p50_us': round(percentile(times, 0.50) * 1e6, 2),
+                    'p99_us': round(percentile(times, 0.99) * 1e6, 2),
+                }
+        report[intent] = row
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-intent and per-stage latency of CodBot's engine")
+    parser.add_argument('--input', metavar='PATH', help="transcript to time instead of the built-in samples")
+    parser.add_argument('--messages', type=int, default=50000)
+    parser.add_argument('--noise', type=float, default=0.2, help="share of random unmatched messages mixed in")
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help="write the report here, '-' for stdout")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    if args.input:
+        with open(args.input, encoding='utf-8') as f:
+            messages = [parse_line(line)[1] for _, line in zip(range(args.messages), f) if line.strip()]
+    else:
+        junk = int(args.messages * args.noise)
+        messages = [rng.choice(SAMPLES) for _ in range(args.messages - junk)] + list(noise(rng, junk))
+        rng.shuffle(messages)
+
+    start = time.perf_counter()
+    traces = run(messages, args.sessions)
+    elapsed = time.perf_counter() - start
+
+    report = {
+        'messages': len(messages),
+        'intents': len(RULES),
+        'seconds': round(elapsed, 3),
+        'per_intent': summarise(traces),
+    }
+    if args.json:
+        text = json.dumps(report, indent=2, sort_keys=True)
+        if args.json == '-':
+            print(text)
+        else:
+            with open(args.json, 'w') as f:
+                f.write(text + '\n')
+    for intent, row in report['per_intent'].items():
+        stages = '  '.join(f"{stage} {times['p50_us']:.1f}/{times['p99_us']:.1f}"
+                           for stage, times in row['stages'].items())
+        print(f"{intent:18} n={row['messages']:<7} p50 {row['p50_us']:7.1f} us  p99 {row['p99_us']:7.1f} us  "
+              f"[{stages}]", file=sys.stderr)
+    print(f"{len(messages)} messages in {elapsed:.2f}s; stage columns are p50/p99 in us", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
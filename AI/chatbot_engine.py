@@ -0,0 +1,635 @@
+import random
+import datetime
+import hashlib
+import json
+import os
+import re
+import string
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future
+from difflib import SequenceMatcher
+
+from chatbot_providers import make_hub
+
+# Intents and fallbacks live in chatbot_rules.json; see load_rules below.
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chatbot_rules.json")
+with open(__file__, "rb") as _source:
+    # part of every pack digest, so a pack built by other engine code is never loaded
+    ENGINE_DIGEST = hashlib.sha256(_source.read()).digest()
+
+def _structure(text):
+    # (index, char, depth) for each "(", ")" and "|" that is regex syntax, stepping over
+    # escapes and character classes; depth counts the groups open before the char.
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            yield i, char, depth
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            yield i, char, depth
+        elif char == "|":
+            yield i, char, depth
+        i += 1
+
+def _split_alternatives(text):
+    # text split at every "|" outside groups
+    alternatives = []
+    start = 0
+    for i, char, depth in _structure(text):
+        if char == "|" and depth == 0:
+            alternatives.append(text[start:i])
+            start = i + 1
+    alternatives.append(text[start:])
+    return alternatives
+
+def leading_words(pattern):
+    # Literal text every match of pattern must start with, one string per alternative of a
+    # leading group, e.g. r"\b(hi|hello) there" -> ["hi", "hello"]. None when that cannot be
+    # told safely, in which case the pattern has to be tried on every message: no leading
+    # \b, a top-level "|" (later alternatives need not start with the first word), or a
+    # leading group that is optional or repeatable from zero.
+    if not pattern.startswith(r"\b"):
+        return None
+    body = pattern[2:]
+    if len(_split_alternatives(body)) > 1:
+        return None
+    if body.startswith("(") and not body.startswith("(?"):
+        close = next((i for i, char, depth in _structure(body) if char == ")" and depth == 0), None)
+        if close is None or body[close + 1:close + 2] in ("?", "*", "{"):
+            return None
+        alternatives = _split_alternatives(body[1:close])
+    else:
+        alternatives = [body]
+    words = []
+    for alternative in alternatives:
+        word = re.match(r"[a-z0-9_]*", alternative).group()
+        if word and alternative[len(word):len(word) + 1] in ("?", "*", "{"):
+            word = word[:-1]  # the last letter is optional
+        if not word:
+            return None
+        words.append(word)
+    return words
+
+class IntentMatcher:
+    # Patterns are compiled once and indexed by the word each of them has to start with.
+    # A message is tokenised in one pass and only patterns whose leading word begins one of
+    # its tokens are run, in RULES order, so per-message cost follows the message rather
+    # than the number of intents. The first intent whose pattern matches anywhere wins,
+    # with the same groups as one re.search per pattern. Given the state() of a matcher
+    # built from the same rules, nothing is indexed and each pattern compiles on first use.
+    def __init__(self, rules, state=None):
+        if state is None:
+            state = self.build_state(rules)
+        self.patterns = [tuple(entry) for entry in state["patterns"]]  # (intent, pattern) in priority order
+        self.index = {word: set(priorities) for word, priorities in state["index"].items()}
+        self.always = state["always"]  # priorities of patterns that cannot be indexed
+        self.compiled = [None] * len(self.patterns)
+        self.word_lengths = sorted({len(word) for word in self.index})
+        self.token_cache = {}
+
+    @staticmethod
+    def build_state(rules):
+        patterns = []
+        index = {}  # leading word -> priorities of the patterns it may start
+        always = []
+        for intent, data in rules.items():
+            for pattern in data["patterns"]:
+                priority = len(patterns)
+                patterns.append((intent, pattern))
+                words = leading_words(pattern)
+                if words is None:
+                    always.append(priority)
+                    continue
+                for word in words:
+                    index.setdefault(word, []).append(priority)
+        return {"patterns": patterns, "index": index, "always": always}
+
+    def state(self):
+        return {
+            "patterns": self.patterns,
+            "index": {word: sorted(priorities) for word, priorities in self.index.items()},
+            "always": self.always,
+        }
+
+    def compile_all(self):
+        for priority in range(len(self.patterns)):
+            self.pattern(priority)
+
+    def pattern(self, priority):
+        compiled = self.compiled[priority]
+        if compiled is None:
+            compiled = self.compiled[priority] = re.compile(self.patterns[priority][1])
+        return compiled
+
+    def token_priorities(self, token):
+        priorities = self.token_cache.get(token)
+        if priorities is None:
+            priorities = set()
+            for length in self.word_lengths:
+                if length > len(token):
+                    break
+                indexed = self.index.get(token[:length])
+                if indexed:
+                    priorities |= indexed
+            priorities = frozenset(priorities)
+            if len(self.token_cache) > 50000:
+                self.token_cache.clear()
+            self.token_cache[token] = priorities
+        return priorities
+
+    def candidates(self, text):
+        found = set(self.always)
+        for token in re.findall(r"\w+", text):
+            found |= self.token_priorities(token)
+        return sorted(found)
+
+    def match(self, text):
+        for priority in self.candidates(text):
+            match = self.pattern(priority).search(text)
+            if match:
+                return self.patterns[priority][0], match.groups()
+        return None, ()
+
+class FuzzyIndex:
+    # Every word of every pattern, mapped to the first intent it appears in and bucketed by
+    # length. Scores are difflib's ratio with the same 0.7 cutoff and tie-break as
+    # get_close_matches(word, vocabulary, n=1). That ratio is not an edit distance, so a
+    # BK-tree or deletion index would change which word wins; instead, lengths and letter
+    # counts that cannot reach the cutoff are ruled out before SequenceMatcher runs.
+    def __init__(self, rules, cutoff=0.7, state=None):
+        self.cutoff = cutoff
+        if state is None:
+            state = self.build_state(rules)
+        self.intents = state["intents"]  # word -> first intent using it
+        # length -> [(word, letter counts)]
+        self.by_length = {length: [tuple(entry) for entry in entries] for length, entries in state["by_length"]}
+        self.cache = {}
+
+    @classmethod
+    def build_state(cls, rules):
+        intents = {}
+        for intent, data in rules.items():
+            for pattern in data["patterns"]:
+                for word in re.findall(r'\b\w+\b', pattern):
+                    intents.setdefault(word, intent)
+        by_length = {}
+        for word in intents:
+            by_length.setdefault(len(word), []).append((word, cls.letter_counts(word)))
+        return {"intents": intents, "by_length": list(by_length.items())}
+
+    def state(self):
+        return {"intents": self.intents, "by_length": list(self.by_length.items())}
+
+    @staticmethod
+    def letter_counts(word):
+        counts = {}
+        for char in word:
+            counts[char] = counts.get(char, 0) + 1
+        return counts
+
+    def closest(self, word):
+        if word in self.intents:
+            return word
+        if word in self.cache:
+            return self.cache[word]
+        size = len(word)
+        counts = self.letter_counts(word)
+        matcher = SequenceMatcher()
+        matcher.set_seq2(word)
+        best = None
+        for length, entries in self.by_length.items():
+            # ratio is 2 * matches / total length and matches <= the shorter word
+            if 2.0 * min(size, length) / (size + length) < self.cutoff:
+                continue
+            for candidate, candidate_counts in entries:
+                common = sum(min(n, counts.get(char, 0)) for char, n in candidate_counts.items())
+                if 2.0 * common / (size + length) < self.cutoff:
+                    continue
+                matcher.set_seq1(candidate)
+                score = matcher.ratio()
+                if score >= self.cutoff and (best is None or (score, candidate) > best):
+                    best = (score, candidate)
+        best = best[1] if best else None
+        if len(self.cache) > 50000:
+            self.cache.clear()
+        self.cache[word] = best
+        return best
+
+    def intent_for(self, word):
+        match = self.closest(word)
+        return self.intents[match] if match else None
+
+class ContextManager:
+    # History is a ring buffer of the last history_size messages and memory keeps the
+    # memory_size most recent distinct facts, so a session's footprint is bounded. With a
+    # store and user_id the state is loaded on first use and written back on each change.
+    def __init__(self, user_id=None, store=None, history_size=10, memory_size=100):
+        self.user_id = user_id
+        self.store = store if user_id is not None else None
+        self.context = {
+            "name": None,
+            "location": None,
+            "memory": deque(maxlen=memory_size),
+            "last_action": None,
+            "conversation_history": deque(maxlen=history_size)
+        }
+        self.loaded = self.store is None
+
+    def load(self):
+        self.loaded = True
+        state = self.store.load(self.user_id)
+        if not state:
+            return
+        for key, value in state.items():
+            if key in ("memory", "conversation_history"):
+                self.context[key].extend(value)
+            else:
+                self.context[key] = value
+
+    def state(self):
+        return {key: list(value) if isinstance(value, deque) else value for key, value in self.context.items()}
+
+    def update(self, key, value):
+        if not self.loaded:
+            self.load()
+        if key == "memory":
+            memory = self.context["memory"]
+            if value in memory:
+                memory.remove(value)  # remembered again, so it is the last to be forgotten
+            memory.append(value)
+        elif key == "conversation_history":
+            self.context["conversation_history"].append(value)
+        else:
+            self.context[key] = value
+        if self.store is not None:
+            self.store.save(self.user_id, self.state())
+    
+    def get(self, key):
+        if not self.loaded:
+            self.load()
+        return self.context.get(key)
+
+class ChatTrace:
+    # Seconds spent in each stage of one reply: "regex", "fuzzy", "context", "format" and
+    # "providers". Each lap() charges the time since the previous one to a stage.
+    def __init__(self):
+        self.intent = "fallback"  # matched intent, "fallback" or "pending" for an answer to a question
+        self.stages = {}
+        self.total = 0.0
+        self.start = self.mark = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self.mark
+        self.mark = now
+
+    def finish(self):
+        self.total = time.perf_counter() - self.start
+
+    def as_dict(self):
+        return {"intent": self.intent, "total": self.total, "stages": dict(self.stages)}
+
+def match_rule(user_input, context_manager, trace=None):
+    user_input = user_input.lower().strip()
+    
+    intent, groups = INTENT_MATCHER.match(user_input)
+    if trace is not None:
+        trace.lap("regex")
+    if intent:
+        data = RULES[intent]
+        context = data.get("context")
+        
+        if context and groups:
+            if context == "name" and len(groups) > 1:
+                context_manager.update("name", groups[1])
+            elif context == "location" and len(groups) > 1:
+                context_manager.update("location", groups[1])
+            elif context == "memory" and len(groups) > 1:
+                context_manager.update("memory", groups[1])
+        
+        context_manager.update("conversation_history", {"input": user_input, "intent": intent})
+        if trace is not None:
+            trace.lap("context")
+        return intent, data, groups
+    
+    for word in re.findall(r'\b\w+\b', user_input):
+        intent = FUZZY_INDEX.intent_for(word)
+        if intent:
+            if trace is not None:
+                trace.lap("fuzzy")
+            data = RULES[intent]
+            context_manager.update("conversation_history", {"input": user_input, "intent": intent})
+            if trace is not None:
+                trace.lap("context")
+            return intent, data, []
+    if trace is not None:
+        trace.lap("fuzzy")
+
+    context_manager.update("conversation_history", {"input": user_input, "intent": "general"})
+    if trace is not None:
+        trace.lap("context")
+    return None, None, [random.choice(FALLBACKS)]
+
+def is_question(text):
+    return text.strip().endswith('?')
+
+def _last_memory(context_manager):
+    memory = context_manager.get("memory")
+    return memory[-1] if memory else None
+
+# Values a response can name, looked up from the session each time it is rendered.
+# time and date take a strftime spec, e.g. {time:%H:%M}.
+DYNAMIC_FIELDS = {
+    "time": lambda context_manager: datetime.datetime.now(),
+    "date": lambda context_manager: datetime.datetime.now(),
+    "name": lambda context_manager: context_manager.get("name"),
+    "memory": _last_memory,
+}
+DEFAULT_SPECS = {"time": "%H:%M:%S", "date": "%A, %B %d, %Y"}
+
+class Template:
+    # A response parsed once into literal text and fields. {0}, {1}, ... are the matched
+    # groups and named fields come from DYNAMIC_FIELDS; render() returns None when a group
+    # did not match or a named value is missing.
+    def __init__(self, text):
+        self.text = text
+        self.parts = []  # literal strings and (field, spec) pairs
+        self.static = True
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            if literal:
+                self.parts.append(literal)
+            if field is None:
+                continue
+            if field == "" or field.isdigit():
+                key = field
+            elif field in DYNAMIC_FIELDS:
+                key = field
+                spec = spec or DEFAULT_SPECS.get(field, "")
+            else:
+                raise ValueError(f"unknown field {{{field}}} in response {text!r}")
+            self.parts.append((key, spec, "{" + field + (":" + spec if spec else "") + "}"))
+            self.static = False
+        if self.static:
+            self.parts = ["".join(self.parts)]
+
+    def render(self, extras, context_manager):
+        if self.static:
+            return self.parts[0]
+        out = []
+        position = 0
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+                continue
+            key, spec, source = part
+            if key in DYNAMIC_FIELDS:
+                value = DYNAMIC_FIELDS[key](context_manager)
+                if value is None:
+                    return None
+            else:
+                index = position if key == "" else int(key)
+                position += 1
+                if index >= len(extras) or extras[index] is None:
+                    return None
+                value = extras[index]
+            out.append(format(value, spec) if spec else str(value))
+        return "".join(out)
+
+class RulePack:
+    # Everything built from a rule file: the rules themselves, the intent matcher, the
+    # fuzzy vocabulary and the compiled templates. state() is what the pack file holds,
+    # plain JSON; a pack made from it skips validation and indexing, and its regexes
+    # compile on first use rather than all at startup.
+    def __init__(self, spec, digest, state=None):
+        self.digest = digest
+        self.rules = spec["intents"]
+        self.fallbacks = spec["fallbacks"]
+        if state is None:
+            for intent, data in self.rules.items():
+                if not data.get("patterns") or not data.get("responses"):
+                    raise ValueError(f"intent {intent!r} needs patterns and responses")
+            if not self.fallbacks:
+                raise ValueError("the rule file needs at least one fallback")
+        self.matcher = IntentMatcher(self.rules, state and state["matcher"])
+        if state is None:
+            self.matcher.compile_all()  # a bad pattern fails the load, not a conversation
+        self.fuzzy = FuzzyIndex(self.rules, state=state and state["fuzzy"])
+        self.templates = {intent: [Template(response) for response in data["responses"]]
+                          for intent, data in self.rules.items()}
+
+    def state(self):
+        return {
+            "digest": self.digest,
+            "intents": self.rules,
+            "fallbacks": self.fallbacks,
+            "matcher": self.matcher.state(),
+            "fuzzy": self.fuzzy.state(),
+        }
+
+def read_rule_file(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(ENGINE_DIGEST + data).hexdigest()
+    return data, digest
+
+def parse_rule_file(path, data):
+    if path.endswith((".yaml", ".yml")):
+        import yaml  # optional, only needed for YAML rule files
+        return yaml.safe_load(data)
+    return json.loads(data)
+
+def load_rules(path=RULES_PATH):
+    # Loads the rule pack stored next to the rule file, or compiles and stores a new one
+    # when the pack is missing, unreadable or was built from other file contents or by
+    # other engine code.
+    data, digest = read_rule_file(path)
+    pack_path = os.path.splitext(path)[0] + ".pack"
+    try:
+        with open(pack_path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state["digest"] == digest:
+            return RulePack(state, digest, state)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+    pack = RulePack(parse_rule_file(path, data), digest)
+    try:
+        temporary = f"{pack_path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(pack.state(), f, separators=(",", ":"))
+        os.replace(temporary, pack_path)
+    except OSError:
+        pass  # read-only install; compile again next start
+    return pack
+
+def install_rules(pack):
+    global RULES, FALLBACKS, INTENT_MATCHER, FUZZY_INDEX, TEMPLATES, _pack
+    _pack = pack
+    RULES, FALLBACKS = pack.rules, pack.fallbacks
+    INTENT_MATCHER, FUZZY_INDEX, TEMPLATES = pack.matcher, pack.fuzzy, pack.templates
+
+_rules_stat = None
+
+def _stat(path):
+    info = os.stat(path)
+    return path, info.st_mtime_ns, info.st_size
+
+def refresh_rules(path=RULES_PATH):
+    # Hot reload: swaps in new rules when the file has changed since it was last looked at.
+    # Sessions and their context are untouched. A file that fails to compile leaves the
+    # current rules in place. Returns True when the rules were replaced.
+    global _rules_stat
+    try:
+        stat = _stat(path)
+    except OSError:
+        return False
+    if stat == _rules_stat:
+        return False
+    _rules_stat = stat
+    try:
+        if read_rule_file(path)[1] == _pack.digest:
+            return False
+        install_rules(load_rules(path))
+    except (OSError, ValueError, KeyError, TypeError, re.error) as e:
+        print(f"keeping the current rules, {path} did not load: {e}", file=sys.stderr)
+        return False
+    return True
+
+install_rules(load_rules())
+_rules_stat = _stat(RULES_PATH)
+
+_default_hub = None
+
+def default_hub():
+    # shared by every session that is not given its own, created on first use
+    global _default_hub
+    if _default_hub is None:
+        _default_hub = make_hub()
+    return _default_hub
+
+def resolve(messages, timeout=None):
+    # replaces provider Futures with their text, for front ends that can afford to wait
+    return [(text.result(timeout) if isinstance(text, Future) else text, tag) for text, tag in messages]
+
+class ChatSession:
+    # One conversation: its context and the question the bot is waiting on, if any.
+    # respond() returns the replies as (text, tag) pairs, tag being "bot" or "error", and
+    # the intent's action. Carrying out "exit" and "open_browser" is up to the front end.
+    # Weather and search replies come from the provider hub as a Future in place of the text.
+    def __init__(self, context_manager=None, providers=None):
+        self.context_manager = context_manager or ContextManager()
+        self.providers = providers or default_hub()
+        self.pending_action = None
+        self.last_match = (None, ())  # intent and groups behind the latest reply
+        self.trace_hook = None  # callable given a ChatTrace after every reply; tracing is off while None
+
+    def respond(self, user_input):
+        if self.trace_hook is None:
+            return self._respond(user_input, None)
+        trace = ChatTrace()
+        result = self._respond(user_input, trace)
+        trace.finish()
+        self.trace_hook(trace)
+        return result
+
+    def _respond(self, user_input, trace):
+        user_input = user_input.strip()
+        self.last_match = (None, ())
+        if not user_input:
+            return [], None
+
+        if self.pending_action:
+            if trace is not None:
+                trace.intent = "pending"
+            messages = self.handle_pending_action(user_input)
+            if trace is not None:
+                trace.lap("providers")
+            return messages, None
+        intent, data, extras = match_rule(user_input, self.context_manager, trace)
+        if not intent:
+            if is_question(user_input):
+                return [("Let me think about that... [Grok 3 would answer here]", "bot")], None
+            return [(extras[0], "error")], None
+
+        self.last_match = (intent, tuple(extras))
+        if trace is not None:
+            trace.intent = intent
+        action = data.get("action")
+        response = self.render_response(intent, extras)
+        if response is None:
+            response = data.get("empty")
+        if response is None and action not in ("weather_search", "search"):
+            # lookups without a query ask for one themselves
+            response = random.choice(FALLBACKS[:3])
+        messages = [(response, "bot")] if response is not None else []
+        if trace is not None:
+            trace.lap("format")
+        
+        if action == "weather_search":
+            messages.append(self.handle_weather_search(extras))
+        elif action == "search":
+            messages.append(self.handle_search(extras))
+        elif action == "remember":
+            if extras and len(extras) > 1:
+                self.context_manager.update("memory", extras[1])
+            if trace is not None:
+                trace.lap("context")
+        if trace is not None and action in ("weather_search", "search"):
+            trace.lap("providers")
+        return messages, action
+
+    def render_response(self, intent, extras):
+        # a random response among those whose fields can all be filled in
+        templates = TEMPLATES[intent]
+        for template in random.sample(templates, len(templates)):
+            response = template.render(extras, self.context_manager)
+            if response is not None:
+                return response
+        return None
+
+    def handle_weather_search(self, extras):
+        location = None
+        
+        if extras and len(extras) > 1:
+            location = extras[1]
+        
+        if not location:
+            self.pending_action = "weather"
+            return ("What location should I check?", "bot")
+        
+        return (self.providers.lookup("weather", location), "bot")
+
+    def handle_search(self, extras):
+        query = None
+        
+        if extras and len(extras) > 1:
+            query = extras[1]
+        
+        if not query:
+            self.pending_action = "search"
+            return ("What would you like to search for?", "bot")
+        
+        return (self.providers.lookup("search", query), "bot")
+
+    def handle_pending_action(self, user_input):
+        pending, self.pending_action = self.pending_action, None
+        if user_input.lower() in ['cancel', 'nevermind']:
+            return [("Action cancelled.", "bot")]
+            
+        if pending == "weather":
+            return [(self.providers.lookup("weather", user_input), "bot")]
+        elif pending == "search":
+            return [(self.providers.lookup("search", user_input), "bot")]
+        return []
@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Backends for the weather and search actions. A provider turns a location or query into
+# reply text; ProviderHub runs them off the caller's thread and hands back Futures, so
+# neither the Tk loop nor the server's event loop waits on the network.
+
+TIMEOUT = (3.05, 5)  # connect, read
+LOOKUP_FAILED = "Sorry, that lookup didn't go through. Try again in a bit."
+
+
+def normalise(query):
+    return " ".join(query.lower().split())
+
+
+def make_session(pool_size=16):
+    # one connection pool shared by every provider and session
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class CannedWeatherProvider:
+    blocking = False  # cheap enough to answer on the caller's thread
+
+    def fetch(self, location):
+        return f"The weather in {location} is sunny with a temperature of 25°C."
+
+
+class CannedSearchProvider:
+    blocking = False
+
+    def fetch(self, query):
+        return f"Search results for '{query}': [Grok 3 would fetch real-time data here]"
+
+
+class WttrWeatherProvider:
+    blocking = True
+
+    def __init__(self, session, base_url="https://wttr.in", timeout=TIMEOUT):
+        self.session = session
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def fetch(self, location):
+        response = self.session.get(f"{self.base_url}/{quote(location)}", params={"format": "%C|%t"},
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        condition, _, temperature = response.text.strip().partition("|")
+        if not temperature:
+            return f"I couldn't find the weather for {location}."
+        return f"The weather in {location} is {condition.strip().lower()} with a temperature of {temperature.strip()}."
+
+
+class DuckDuckGoSearchProvider:
+    blocking = True
+
+    def __init__(self, session, base_url="https://api.duckduckgo.com", timeout=TIMEOUT):
+        self.session = session
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def fetch(self, query):
+        response = self.session.get(f"{self.base_url}/", timeout=self.timeout,
+                                    params={"q": query, "format": "json", "no_html": 1, "skip_disambig": 1})
+        response.raise_for_status()
+        data = response.json()
+        answer = data.get("AbstractText") or data.get("Answer")
+        link = data.get("AbstractURL")
+        if not answer:
+            for topic in data.get("RelatedTopics", []):
+                if topic.get("Text"):
+                    answer, link = topic["Text"], topic.get("FirstURL")
+                    break
+        if not answer:
+            return f"No quick answer for '{query}'. Try https://duckduckgo.com/?q={quote(query)}"
+        return f"Search results for '{query}': {answer}" + (f" ({link})" if link else "")
+
+
+class TTLCache:
+    # LRU capped at max_entries; entries older than ttl seconds count as missing
+    def __init__(self, ttl=600, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expires, value)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, value):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class ProviderHub:
+    # Runs lookups for every session. Answers are cached by normalised query for ttl
+    # seconds, and a lookup that is already running is shared rather than sent twice.
+    FAILURES = {
+        "weather": "Sorry, I couldn't reach the weather service for {0} right now.",
+        "search": "Sorry, the search for '{0}' didn't go through. Try again in a bit.",
+    }
+
+    def __init__(self, weather=None, search=None, ttl=600, max_entries=1024, workers=8):
+        self.providers = {
+            "weather": weather or CannedWeatherProvider(),
+            "search": search or CannedSearchProvider(),
+        }
+        self.cache = TTLCache(ttl, max_entries)
+        self.in_flight = {}  # cache key -> Future
+        self.lock = threading.Lock()
+        self.workers = workers
+        self._executor = None
+
+    def lookup(self, kind, query):
+        provider = self.providers[kind]
+        if not provider.blocking:
+            return self._done(provider.fetch(query))
+        query = normalise(query)
+        key = (kind, query)
+        with self.lock:
+            text = self.cache.get(key)
+            if text is not None:
+                return self._done(text)
+            future = self.in_flight.get(key)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="provider")
+                future = self._executor.submit(self._fetch, provider, kind, key, query)
+                self.in_flight[key] = future
+        return future
+
+    def _fetch(self, provider, kind, key, query):
+        try:
+            text = provider.fetch(query)
+        except Exception:
+            # whatever went wrong, the waiting sessions get an apology and nothing is cached
+            return self.FAILURES[kind].format(query)
+        else:
+            with self.lock:
+                self.cache.put(key, text)
+            return text
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+
+    @staticmethod
+    def _done(text):
+        future = Future()
+        future.set_result(text)
+        return future
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def make_hub(name="canned", **options):
+    if name == "canned":
+        return ProviderHub(**options)
+    if name == "http":
+        session = make_session()
+        return ProviderHub(WttrWeatherProvider(session), DuckDuckGoSearchProvider(session), **options)
+    raise ValueError(f"unknown providers {name!r}")
@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from concurrent.futures import Future
+
+from chatbot_engine import ChatSession, ContextManager, refresh_rules
+from chatbot_providers import LOOKUP_FAILED, make_hub
+from chatbot_store import ContextStore
+
+# Line-delimited JSON over TCP. Each request line is {"text": "..."} and may name a
+# "session" to continue, so a client behind a load balancer can reconnect (to the same
+# process) without losing its context. Each reply line is
+# {"session": ..., "messages": [{"text": ..., "tag": ...}], "action": ...}
+# or {"error": ...} for a line that could not be read. A connection that names no session
+# gets one of its own.
+
+MAX_LINE = 64 * 1024
+RULES_POLL = 2.0  # seconds between checks of the rule file for edits
+
+
+class SessionStore:
+    # Sessions by id, oldest use first; ones idle for longer than idle_timeout, or past
+    # max_sessions, are dropped. With a ContextStore a dropped session's context is
+    # loaded back when its id is seen again.
+    def __init__(self, max_sessions=10000, idle_timeout=1800, providers=None, context_store=None):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.providers = providers
+        self.context_store = context_store
+        self.sessions = {}  # id -> [session, last used]
+
+    def get(self, session_id=None):
+        now = time.monotonic()
+        entry = self.sessions.pop(session_id, None) if session_id is not None else None
+        if entry is None:
+            if session_id is None:
+                session_id = uuid.uuid4().hex
+            context_manager = ContextManager(session_id, self.context_store)
+            entry = [ChatSession(context_manager, self.providers), now]
+        entry[1] = now
+        self.sessions[session_id] = entry
+        self.expire(now)
+        return session_id, entry[0]
+
+    def expire(self, now):
+        while self.sessions:
+            oldest = next(iter(self.sessions))
+            if len(self.sessions) <= self.max_sessions and now - self.sessions[oldest][1] < self.idle_timeout:
+                break
+            del self.sessions[oldest]
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+class ChatServer:
+    def __init__(self, store=None):
+        self.store = store if store is not None else SessionStore()  # an empty store is falsy
+
+    async def handle_line(self, line, default_id):
+        try:
+            request = json.loads(line)
+            text = request["text"]
+            if not isinstance(text, str):
+                raise TypeError("text must be a string")
+        except (ValueError, KeyError, TypeError) as e:
+            return {"error": f"bad request: {e}"}, default_id
+        session_id = request.get("session", default_id)
+        session_id, session = self.store.get(None if session_id is None else str(session_id))
+        messages, action = session.respond(text)
+        replies = []
+        for message, tag in messages:
+            if isinstance(message, Future):
+                try:
+                    message = await asyncio.wrap_future(message)
+                except asyncio.CancelledError:
+                    if not message.cancelled():
+                        raise  # the connection itself is being shut down
+                    message = LOOKUP_FAILED
+                except Exception:
+                    # a failed lookup is one bad answer, not a reason to drop the connection
+                    message = LOOKUP_FAILED
+            replies.append({"text": message, "tag": tag})
+        return {
+            "session": session_id,
+            "messages": replies,
+            "action": action,
+        }, session_id
+
+    async def handle_client(self, reader, writer):
+        session_id = None
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # longer than MAX_LINE, the rest of the stream cannot be framed
+                    writer.write(b'{"error": "line too long"}\n')
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                reply, session_id = await self.handle_line(line, session_id)
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+                if reply.get("action") == "exit":
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port, limit=MAX_LINE)
+        addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+        print(f"CodBot listening on {addresses}", file=sys.stderr)
+        watcher = asyncio.create_task(self.watch_rules())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+    async def watch_rules(self):
+        # swaps in edited rules between messages; sessions stay connected and keep their context
+        while True:
+            await asyncio.sleep(RULES_POLL)
+            if refresh_rules():
+                print("rules reloaded", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve CodBot sessions as line-delimited JSON over TCP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-sessions', type=int, default=10000)
+    parser.add_argument('--idle-timeout', type=float, default=1800, help="seconds before an unused session is dropped")
+    parser.add_argument('--providers', choices=['canned', 'http'], default='canned',
+                        help="where weather and search answers come from")
+    parser.add_argument('--cache-ttl', type=float, default=600, help="seconds to reuse a weather or search answer")
+    parser.add_argument('--state', metavar='PATH', help="SQLite file to keep each session's context in across restarts")
+    args = parser.parse_args(argv)
+
+    providers = make_hub(args.providers, ttl=args.cache_ttl)
+    context_store = ContextStore(args.state) if args.state else None
+    server = ChatServer(SessionStore(args.max_sessions, args.idle_timeout, providers, context_store))
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
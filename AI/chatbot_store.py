@@ -0,0 +1,49 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+STATE_PATH = os.path.join(os.path.expanduser('~'), '.codbot', 'context.db')
+
+
+class ContextStore:
+    # One row per user holding their ContextManager state as JSON. Rows are read when a
+    # session for that user first needs its context and rewritten when it changes.
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS users "
+                                     "(user_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL)")
+        return self._connection
+
+    def load(self, user_id):
+        with self.lock:
+            row = self.connection.execute("SELECT state FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, user_id, state):
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO users (user_id, state, updated) VALUES (?, ?, ?)",
+                                    (user_id, json.dumps(state), time.time()))
+
+    def delete(self, user_id):
+        with self.lock:
+            self.connection.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+
+    def close(self):
+        with self.lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
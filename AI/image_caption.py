@@ -1,28 +1,34 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from PIL import Image, ImageTk, ImageDraw, ImageFont
-import torch
-from transformers import BlipProcessor, BlipForConditionalGeneration
 import os
 import threading
 from datetime import datetime
 import queue
 
+from caption_cache import CaptionCache
+from caption_engine import CaptionEngine, IMAGE_EXTENSIONS, MODEL_ID
+
 
 class ImageCaptioningApp:
-    def __init__(self, root, use_dnd=False):
+    def __init__(self, root, use_dnd=False, batch_size=8, workers=None):
         self.root = root
         self.root.title("🎯 Image Captioning AI - Internship Project")
         self.root.geometry("850x650")
         self.root.minsize(650, 450)
 
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.processor = None
-        self.model = None
+        # CAPTION_MODEL may point at a local snapshot directory. A local or cached model is
+        # always loaded offline; CAPTION_OFFLINE=1 also refuses to download a missing one.
+        self.engine = CaptionEngine(os.environ.get("CAPTION_MODEL", MODEL_ID), batch_size=batch_size,
+                                    workers=workers, thumbnail_size=(400, 300), cache=CaptionCache(),
+                                    offline=os.environ.get("CAPTION_OFFLINE") == "1")
+        self.device = self.engine.device
         self.model_loading = False
         self.caption_queue = queue.Queue()
         self.current_caption = ""
         self.use_dnd = use_dnd
+        self.results = queue.Queue(maxsize=64)  # finished captions on their way to the Tk thread
+        self.jobs = 0
 
         self.set_styles()
         self.setup_gui()
@@ -121,30 +127,42 @@ class ImageCaptioningApp:
 
     def load_model(self):
         try:
-            self.processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-            self.model = BlipForConditionalGeneration.from_pretrained(
-                "Salesforce/blip-image-captioning-base").to(self.device)
-            self.caption_var.set(f"✅ Model loaded on {self.device}. Upload an image!")
+            self.engine.load()
+            self.device = self.engine.device
+            ready = f"✅ Model loaded on {self.device}. Upload an image!"
+            self.caption_var.set(ready)
         except Exception as e:
             self.caption_var.set(f"❌ Error loading model: {e}")
+            return
         finally:
             self.model_loading = False
+        # captions started meanwhile wait on the engine's lock for at most this one pass
+        try:
+            self.engine.warm_up()
+        except Exception as e:
+            print(f"Warm-up failed: {e}")
+        timings = self.engine.describe_timings()
+        print(f"Model ready ({timings})")
+        # shown on screen too, for kiosks where nobody reads stdout; a caption already
+        # on display is left alone
+        if self.caption_var.get() == ready:
+            self.caption_var.set(f"{ready}\n({timings})")
 
     def upload_images(self):
         filetypes = [("Image files", "*.jpg *.jpeg *.png *.bmp")]
         paths = filedialog.askopenfilenames(filetypes=filetypes)
         if paths:
-            threading.Thread(target=self.process_images, args=(paths,), daemon=True).start()
+            self.start_processing(paths)
 
     def handle_drop(self, event):
         paths = self.root.tk.splitlist(event.data)
-        valid_paths = [p for p in paths if p.lower().endswith((".jpg", ".jpeg", ".png", ".bmp"))]
+        valid_paths = [p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS)]
         if valid_paths:
-            threading.Thread(target=self.process_images, args=(valid_paths,), daemon=True).start()
+            self.start_processing(valid_paths)
         else:
             messagebox.showerror("Error", "⚠️ No valid image files dropped.")
 
-    def process_images(self, paths):
+    def start_processing(self, paths):
         if self.model_loading:
             messagebox.showwarning("Please wait", "Model is still loading. Please wait.")
             return
@@ -152,28 +170,44 @@ class ImageCaptioningApp:
         self.progress["maximum"] = len(paths)
         self.progress["value"] = 0
         self.caption_var.set("⏳ Processing images...")
+        self.jobs += 1
+        if self.jobs == 1:
+            self.root.after(50, self.poll_results)
+        threading.Thread(target=self.process_images, args=(paths,), daemon=True).start()
 
-        for i, path in enumerate(paths):
+    def process_images(self, paths):
+        # runs off the Tk thread; everything it finds goes through self.results
+        try:
+            for path, thumbnail, result in self.engine.caption_stream(paths):
+                self.results.put(("caption", path, thumbnail, result))
+        finally:
+            self.results.put(("done", len(paths)))
+
+    def poll_results(self):
+        while True:
             try:
-                image = Image.open(path).convert("RGB")
-                inputs = self.processor(image, return_tensors="pt").to(self.device)
-                output = self.model.generate(**inputs, max_length=50, num_beams=5)
-                caption = self.processor.decode(output[0], skip_special_tokens=True)
-                self.current_caption = caption
-                self.display_image(image)
-                self.caption_var.set(caption)
-                self.add_to_history(path, caption)
-            except Exception as e:
-                error_msg = f"❌ Error processing {os.path.basename(path)}: {e}"
+                item = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] == "done":
+                self.jobs -= 1
+                if item[1] > 1:
+                    self.caption_var.set(f"✅ Finished processing {item[1]} image(s).")
+                continue
+            _, path, thumbnail, result = item
+            if isinstance(result, str):
+                self.current_caption = result
+                self.display_image(thumbnail)
+                self.caption_var.set(result)
+                self.add_to_history(path, result)
+            else:
+                error_msg = f"❌ Error processing {os.path.basename(path)}: {result}"
                 self.caption_var.set(error_msg)
                 self.add_to_history(path, error_msg)
                 self.display_image(Image.new("RGB", (400, 300), "gray"))
-
-            self.progress["value"] = i + 1
-            self.root.update_idletasks()
-
-        if len(paths) > 1:
-            self.caption_var.set(f"✅ Finished processing {len(paths)} image(s).")
+            self.progress["value"] += 1
+        if self.jobs:
+            self.root.after(50, self.poll_results)
 
     def display_image(self, image):
         image = image.copy()
@@ -0,0 +1,50 @@
+import itertools
+import types
+
+import pytest
+
+import caption_cache
+from caption_cache import CaptionCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # a strictly increasing clock, so the order of use never depends on timer resolution
+    clock = itertools.count(1)
+    monkeypatch.setattr(caption_cache, "time", types.SimpleNamespace(time=lambda: next(clock)))
+    cache = CaptionCache(str(tmp_path / "captions.db"), max_entries=10)
+    yield cache
+    cache.close()
+
+
+def stored(cache):
+    return cache.connection.execute("SELECT COUNT(*) FROM captions").fetchone()[0]
+
+
+def test_recently_read_key_survives_eviction(cache):
+    for number in range(10):
+        cache.put(f"k{number}", f"caption {number}")
+    assert cache.get("k0") == "caption 0"
+    cache.put("k10", "caption 10")
+    # over max_entries, the least recently used are dropped down to 90%
+    assert cache.count == stored(cache) == 9
+    assert cache.get("k0") == "caption 0"
+    assert cache.get("k1") is None and cache.get("k2") is None
+    assert cache.get("k10") == "caption 10"
+
+
+def test_replaced_caption_is_counted_once(cache):
+    cache.put("k", "old")
+    cache.put("k", "new")
+    assert cache.get("k") == "new"
+    assert cache.count == stored(cache) == 1
+
+
+def test_count_is_read_back_on_reopen(cache, tmp_path):
+    for number in range(5):
+        cache.put(f"k{number}", "caption")
+    cache.close()
+    reopened = CaptionCache(cache.path, max_entries=10)
+    assert reopened.get("k4") == "caption"
+    assert reopened.count == 5
+    reopened.close()
@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("PIL")  # caption_engine needs it at import, though none of these calls use it
+
+from caption_cli import Writer, find_images, finished_paths, unfinished
+
+
+def write_rows(path, fmt, rows, resume=False):
+    writer = Writer(str(path), fmt, resume)
+    for row in rows:
+        writer.write(*row)
+    writer.close()
+
+
+def test_cut_off_jsonl_line_is_removed_and_skipped(tmp_path):
+    output = tmp_path / "out.jsonl"
+    write_rows(output, 'jsonl', [("a.jpg", "a cat", ""), ("b.jpg", "a dog", "")])
+    complete = output.read_bytes()
+    with open(output, 'ab') as f:
+        f.write(b'{"path": "c.jpg", "capt')
+    done = finished_paths(str(output), 'jsonl', False)
+    assert done == {os.path.abspath("a.jpg"), os.path.abspath("b.jpg")}
+    assert output.read_bytes() == complete
+
+
+def test_line_separator_inside_a_caption(tmp_path):
+    output = tmp_path / "out.jsonl"
+    write_rows(output, 'jsonl', [("a.jpg", "first\u2028second\u0085third", ""), ("b.jpg", "a dog", "")])
+    assert "\u2028" in output.read_text(encoding='utf-8')  # written raw, not escaped
+    done = finished_paths(str(output), 'jsonl', False)
+    assert done == {os.path.abspath("a.jpg"), os.path.abspath("b.jpg")}
+
+
+def test_csv_resume_keeps_one_header(tmp_path):
+    output = tmp_path / "out.csv"
+    write_rows(output, 'csv', [("a.jpg", "a cat\non a mat", "")])
+    assert finished_paths(str(output), 'csv', False) == {os.path.abspath("a.jpg")}
+    write_rows(output, 'csv', [("b.jpg", "a dog", "")], resume=True)
+    lines = output.read_text(encoding='utf-8').splitlines()
+    assert [line for line in lines if line.startswith("path,")] == ["path,caption,error"]
+    assert finished_paths(str(output), 'csv', False) == {os.path.abspath("a.jpg"), os.path.abspath("b.jpg")}
+
+
+@pytest.mark.parametrize("fmt", ['jsonl', 'csv'])
+def test_retry_errors_leaves_failed_images_unfinished(tmp_path, fmt):
+    output = tmp_path / f"out.{fmt}"
+    write_rows(output, fmt, [("a.jpg", "a cat", ""), ("b.jpg", "", "cannot identify image file")])
+    assert finished_paths(str(output), fmt, False) == {os.path.abspath("a.jpg"), os.path.abspath("b.jpg")}
+    assert finished_paths(str(output), fmt, True) == {os.path.abspath("a.jpg")}
+
+
+def test_duplicate_inputs_are_captioned_once(tmp_path):
+    for name in ("a.jpg", "b.png", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    a = str(tmp_path / "a.jpg")
+    listing = tmp_path / "list.txt"
+    listing.write_text(f"{a}\n\n{a}\n")
+    inputs = [a, str(tmp_path), os.path.join(str(tmp_path), "*.jpg")]
+    paths = list(unfinished(find_images(inputs, str(listing)), set()))
+    assert paths == [a, str(tmp_path / "b.png")]
+
+
+def test_finished_images_are_skipped(tmp_path):
+    output = tmp_path / "out.jsonl"
+    write_rows(output, 'jsonl', [(str(tmp_path / "a.jpg"), "a cat", "")])
+    done = finished_paths(str(output), 'jsonl', False)
+    assert list(unfinished([str(tmp_path / "a.jpg"), str(tmp_path / "b.jpg")], done)) == [str(tmp_path / "b.jpg")]
+    assert json.loads(output.read_text(encoding='utf-8'))["caption"] == "a cat"
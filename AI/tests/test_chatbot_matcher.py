@@ -0,0 +1,57 @@
+import re
+
+import pytest
+
+from chatbot_bench import SAMPLES
+from chatbot_engine import RULES, IntentMatcher, leading_words
+
+TRICKY = {
+    "bar": {"patterns": [r"\bhi|bye"]},
+    "bounded_bar": {"patterns": [r"\bhello\b|\bbye\b"]},
+    "group_then_bar": {"patterns": [r"\b(hi|hello)|goodbye"]},
+    "optional_group": {"patterns": [r"\b(hey)?there"]},
+    "starred_group": {"patterns": [r"\b(yo)*man"]},
+    "counted_group": {"patterns": [r"\b(ok){0,2}cool"]},
+    "optional_letter": {"patterns": [r"\bthanks?\b"]},
+    "escaped_paren": {"patterns": [r"\b(a\)|b)c"]},
+    "class": {"patterns": [r"\b([(]x|why)z"]},
+    "plain": {"patterns": [r"\b(good|great) (day|night)\b"]},
+}
+MESSAGES = [
+    "hi", "bye", "say bye now", "hello", "oh bye", "goodbye", "well goodbye then", "there",
+    "hey there", "heythere", "man", "yoyoman", "cool", "okcool", "thank you", "thanks a lot",
+    "a)c", "bc", "(z", "whyz", "good night", "great day", "nothing to see", "",
+]
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    (r"\bhi|bye", None),
+    (r"\bhello\b|\bbye\b", None),
+    (r"\b(hi|hello)|goodbye", None),
+    (r"\b(hi)?there", None),
+    (r"\b(hi)*there", None),
+    (r"\b(hi){0,1}there", None),
+    (r"hi", None),
+    (r"\b(hi|hello) there", ["hi", "hello"]),
+    (r"\bthanks?\b", ["thank"]),
+    (r"\b(a\)|b)c", ["a", "b"]),
+])
+def test_leading_words(pattern, expected):
+    assert leading_words(pattern) == expected
+
+
+def naive_match(rules, text):
+    # every pattern of every intent in order, the way match_rule worked before the index
+    for intent, rule in rules.items():
+        for pattern in rule["patterns"]:
+            match = re.search(pattern, text)
+            if match:
+                return intent, match.groups()
+    return None, ()
+
+
+@pytest.mark.parametrize("rules", [TRICKY, RULES], ids=["tricky", "shipped"])
+def test_matcher_agrees_with_naive_search(rules):
+    matcher = IntentMatcher(rules)
+    for text in MESSAGES + SAMPLES:
+        assert matcher.match(text) == naive_match(rules, text), text
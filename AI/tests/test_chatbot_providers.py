@@ -0,0 +1,114 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+import pytest
+
+from chatbot_providers import LOOKUP_FAILED, ProviderHub, WttrWeatherProvider, make_session
+from chatbot_server import ChatServer, SessionStore
+
+
+class StubWttr(BaseHTTPRequestHandler):
+    # answers /<location> like wttr.in's "%C|%t" format; "slow" locations take delay seconds
+    delay = 0.3
+
+    def do_GET(self):
+        location = unquote(urlsplit(self.path).path.strip("/"))
+        with self.server.lock:
+            self.server.hits.append(location)
+        if location.startswith("slow"):
+            time.sleep(self.delay)
+        body = b"Sunny|+21\xc2\xb0C"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FailingProvider:
+    blocking = True
+
+    def fetch(self, query):
+        raise RuntimeError("not a network error")
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubWttr)
+    server.daemon_threads = True
+    server.hits = []
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_stub_hub(stub, timeout=2, ttl=600):
+    url = f"http://127.0.0.1:{stub.server_address[1]}"
+    return ProviderHub(WttrWeatherProvider(make_session(), url, timeout=timeout), ttl=ttl)
+
+
+def test_answer_comes_from_the_stub(stub):
+    hub = make_stub_hub(stub)
+    assert hub.lookup("weather", "Paris").result(5) == "The weather in paris is sunny with a temperature of +21°C."
+    hub.close()
+
+
+def test_timeout_gives_an_apology_and_is_not_cached(stub):
+    hub = make_stub_hub(stub, timeout=0.05)
+    assert hub.lookup("weather", "slow town").result(5) == hub.FAILURES["weather"].format("slow town")
+    assert not hub.in_flight
+    assert hub.cache.get(("weather", "slow town")) is None
+    hub.close()
+
+
+def test_ttl_hit_skips_the_network_until_expiry(stub):
+    hub = make_stub_hub(stub, ttl=0.2)
+    first = hub.lookup("weather", "Oslo").result(5)
+    assert hub.lookup("weather", "  oslo ").result(5) == first
+    assert stub.hits == ["oslo"]
+    time.sleep(0.3)
+    hub.lookup("weather", "Oslo").result(5)
+    assert stub.hits == ["oslo", "oslo"]
+    hub.close()
+
+
+def test_concurrent_lookups_share_one_request(stub):
+    hub = make_stub_hub(stub)
+    futures = [hub.lookup("weather", "slow city") for _ in range(5)]
+    assert all(future is futures[0] for future in futures)
+    assert len({future.result(5) for future in futures}) == 1
+    assert stub.hits == ["slow city"]
+    assert not hub.in_flight
+    hub.close()
+
+
+def test_unexpected_error_clears_in_flight():
+    hub = ProviderHub(FailingProvider())
+    assert hub.lookup("weather", "Rome").result(5) == hub.FAILURES["weather"].format("rome")
+    assert not hub.in_flight
+    hub.close()
+
+
+class BrokenHub:
+    # a hub whose lookups fail in a way _fetch would never produce, e.g. cancelled at shutdown
+    def lookup(self, kind, query):
+        future = Future()
+        future.set_exception(RuntimeError("boom"))
+        return future
+
+
+def test_server_answers_when_a_lookup_fails():
+    server = ChatServer(SessionStore(providers=BrokenHub()))
+    reply, session_id = asyncio.run(server.handle_line(json.dumps({"text": "weather in london"}), None))
+    assert reply["messages"][-1] == {"text": LOOKUP_FAILED, "tag": "bot"}
+    assert session_id == reply["session"]
@@ -0,0 +1,58 @@
+import json
+import shutil
+
+import chatbot_engine
+from chatbot_bench import SAMPLES
+from chatbot_engine import RULES_PATH, ChatSession, load_rules, resolve
+
+
+def copy_rules(tmp_path):
+    path = str(tmp_path / "rules.json")
+    shutil.copy(RULES_PATH, path)
+    return path
+
+
+def test_pack_is_json_and_loads_without_compiling(tmp_path):
+    path = copy_rules(tmp_path)
+    built = load_rules(path)
+    with open(tmp_path / "rules.pack", encoding="utf-8") as f:
+        assert json.load(f)["digest"] == built.digest
+    loaded = load_rules(path)
+    assert loaded.digest == built.digest
+    assert loaded.matcher.compiled == [None] * len(built.matcher.patterns)
+    assert loaded.rules == built.rules and loaded.fallbacks == built.fallbacks
+    for text in SAMPLES:
+        assert loaded.matcher.match(text) == built.matcher.match(text), text
+        for word in text.split():
+            assert loaded.fuzzy.intent_for(word) == built.fuzzy.intent_for(word), word
+
+
+def test_pack_is_rebuilt_when_the_engine_changes(tmp_path, monkeypatch):
+    path = copy_rules(tmp_path)
+    first = load_rules(path)
+    monkeypatch.setattr(chatbot_engine, "ENGINE_DIGEST", b"other engine code")
+    second = load_rules(path)
+    assert second.digest != first.digest
+    assert None not in second.matcher.compiled  # built afresh, every pattern compiled
+
+
+def test_corrupt_pack_is_replaced(tmp_path):
+    path = copy_rules(tmp_path)
+    (tmp_path / "rules.pack").write_text("{not json")
+    pack = load_rules(path)
+    with open(tmp_path / "rules.pack", encoding="utf-8") as f:
+        assert json.load(f)["digest"] == pack.digest
+
+
+def test_responses_use_the_captured_value():
+    for text, value in [("weather in paris", "paris"), ("search for tk grid", "tk grid"),
+                        ("remember that the keys are in the drawer", "the keys are in the drawer")]:
+        messages, _ = ChatSession().respond(text)
+        assert value in messages[0][0], messages
+        assert "{" not in messages[0][0]
+
+
+def test_lookup_without_a_query_asks_once():
+    session = ChatSession()
+    assert resolve(session.respond("weather")[0]) == [("What location should I check?", "bot")]
+    assert session.pending_action == "weather"
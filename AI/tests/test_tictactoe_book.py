@@ -0,0 +1,14 @@
+from tictactoe_book import OpeningBook, build, verify
+
+POSITIONS_TO_MOVE = 4520  # reachable 3x3 positions that are neither won nor full
+
+
+def test_table_backed_search_agrees_with_plain_minimax():
+    # build() runs minimax with one transposition table shared across every position, so
+    # its bound handling and symmetry remapping are checked against a table-free search
+    data = build()
+    assert verify(data) == POSITIONS_TO_MOVE
+
+
+def test_shipped_book_is_current():
+    assert OpeningBook.load().data == build()
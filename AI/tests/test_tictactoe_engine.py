@@ -0,0 +1,70 @@
+import random
+import time
+
+import pytest
+
+from tictactoe_engine import Board, TranspositionTable, _negamax, _SearchContext, search
+
+INF = float('inf')
+
+
+def random_position(rng, size, win_length, pieces):
+    # a position with no winner yet and the side to move
+    while True:
+        board = Board(size, win_length)
+        for number in range(pieces):
+            i, j = rng.choice(board.empty_cells())
+            board.place(i, j, 'XO'[number % 2])
+        if not board.is_win('X') and not board.is_win('O'):
+            return board, 'XO'[pieces % 2], 'XO'[(pieces + 1) % 2]
+
+
+@pytest.mark.parametrize("size, win_length", [(3, 3), (4, 4), (5, 4), (6, 4), (7, 5)])
+def test_wins_at_agrees_with_is_win(size, win_length):
+    rng = random.Random(size * 10 + win_length)
+    for _ in range(200):
+        board = Board(size, win_length)
+        symbol = 'X'
+        for index in rng.sample(range(size * size), size * size):
+            board.toggle(index, symbol)
+            assert board.wins_at(index, symbol) == board.is_win(symbol)
+            if board.is_win(symbol):
+                break
+            symbol = 'O' if symbol == 'X' else 'X'
+
+
+@pytest.mark.parametrize("size, win_length", [(4, 4), (5, 4)])
+def test_search_takes_an_immediate_win(size, win_length):
+    board = Board(size, win_length)
+    for j in range(win_length - 1):
+        board.place(0, j, 'X')
+        board.place(2, j, 'O')
+    # O threatens too, but X moves first and should finish its own line
+    assert search(board, 'X', 'O', time_limit=2.0) == (0, win_length - 1)
+
+
+@pytest.mark.parametrize("size, win_length", [(4, 4), (5, 4)])
+def test_search_blocks_an_immediate_loss(size, win_length):
+    board = Board(size, win_length)
+    for j in range(win_length - 1):
+        board.place(1, j, 'X')
+    board.place(3, 3, 'O')
+    board.place(3, 1, 'O')
+    assert search(board, 'O', 'X', time_limit=2.0) == (1, win_length - 1)
+
+
+def test_table_scores_do_not_depend_on_ply():
+    # the table outlives a search, so the same position must score the same whether its
+    # entries were stored deep in an earlier search or at the root of this one
+    rng = random.Random(1)
+
+    def score(board, side, other, depth, table, ply):
+        ctx = _SearchContext(board.copy(), time.perf_counter() + 60, table, None, None)
+        return _negamax(ctx, side, other, depth, -INF, INF, ply)[0]
+
+    for _ in range(25):
+        board, side, other = random_position(rng, 4, 3, rng.randint(2, 6))
+        depth = min(5, len(board.empty_cells()))
+        shared = TranspositionTable()
+        score(board, side, other, depth, shared, 5)
+        assert score(board, side, other, depth, shared, 0) == score(board, side, other, depth, TranspositionTable(), 0)
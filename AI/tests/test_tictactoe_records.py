@@ -0,0 +1,73 @@
+import pytest
+
+from tictactoe_records import GameLog, GameRecord, MAGIC
+
+
+def sample(result='ai', size=3, moves=None):
+    moves = moves or [('X', 0, 0), ('O', 1, 1), ('X', 0, 1), ('O', 0, 2), ('X', 2, 0), ('O', 1, 0),
+                      ('X', 2, 2), ('O', 1, 2)]
+    return GameRecord(moves, result, 'Hard', 'X', size, size, started=1700000000.25, duration=12.5,
+                      move_times=[0.5 * n for n in range(len(moves))])
+
+
+def same(a, b):
+    return (a.moves, a.result, a.difficulty, a.player_symbol, a.size, a.win_length, a.started, a.duration,
+            a.move_times) == (b.moves, b.result, b.difficulty, b.player_symbol, b.size, b.win_length,
+                              b.started, b.duration, b.move_times)
+
+
+@pytest.mark.parametrize("record", [sample(), sample('draw', 5, [('X', 4, 4), ('O', 3, 0)]),
+                                    sample('player', 3, [('X', 1, 1)])])
+def test_pack_round_trip(record):
+    assert same(GameRecord.unpack(record.pack()), record)
+    assert same(GameRecord.unpack(b'pad' + record.pack(), 3), record)
+
+
+def test_log_round_trip(tmp_path):
+    log = GameLog(str(tmp_path / "games.bin"))
+    records = [sample(), sample('draw', 4, [('X', 3, 3)])]
+    for record in records:
+        log.append(record)
+    reopened = GameLog(log.path)
+    assert len(reopened) == 2
+    assert all(same(read, record) for read, record in zip(reopened, records))
+
+
+def test_cut_off_record_is_dropped_and_appends_stay_aligned(tmp_path):
+    log = GameLog(str(tmp_path / "games.bin"))
+    log.append(sample())
+    log.append(sample('draw'))
+    with open(log.path, 'r+b') as f:
+        f.truncate(f.seek(0, 2) - 3)
+    recovered = GameLog(log.path)
+    assert len(recovered) == 1
+    recovered.append(sample('player'))
+    reopened = GameLog(log.path)
+    assert [record.result for record in reopened] == ['ai', 'player']
+
+
+@pytest.mark.parametrize("contents", [b'', MAGIC[:2]])
+def test_empty_or_half_created_file_counts_as_new(tmp_path, contents):
+    path = tmp_path / "games.bin"
+    path.write_bytes(contents)
+    log = GameLog(str(path))
+    assert len(log) == 0
+    log.append(sample())
+    assert [record.result for record in GameLog(str(path))] == ['ai']
+
+
+def test_foreign_file_is_refused(tmp_path):
+    path = tmp_path / "games.bin"
+    path.write_bytes(b'not a game log')
+    with pytest.raises(ValueError):
+        len(GameLog(str(path)))
+
+
+def test_damaged_record_reads_as_value_error(tmp_path):
+    log = GameLog(str(tmp_path / "games.bin"))
+    log.append(sample())
+    len(log)
+    with open(log.path, 'r+b') as f:
+        f.truncate(len(MAGIC) + 4)  # changed underneath an already indexed log
+    with pytest.raises(ValueError):
+        log.read(0)
@@ -1,9 +1,16 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
+import tkinter.font as tkfont
 import random
 import time
 import math
 import sys
+import queue
+import threading
+from tictactoe_engine import Board, CancelToken, SearchCancelled, SearchStats, TranspositionTable, minimax, search
+from tictactoe_book import load_book
+from tictactoe_mcts import MCTSPlayer
+from tictactoe_records import GameLog, GameRecord
 
 
 try:
@@ -23,9 +30,83 @@ except ImportError:
         except ImportError:
             SOUND_ENABLED = False
 
+BOARD_PRESETS = [(3, 3), (4, 4), (5, 4), (6, 5), (7, 5)]
+
+class VirtualList:
+    # Scrolling list on a Canvas that only keeps text items for the rows in view,
+    # so showing thousands of rows costs the same as showing one screenful.
+    def __init__(self, parent, row_count, row_text, on_select=None, row_height=24,
+                 bg='#16213e', fg='#f9f9f9', select_bg='#34495e', font=("Arial", 11)):
+        self.row_count = row_count
+        self.row_text = row_text  # row -> (text, color)
+        self.on_select = on_select
+        self.row_height = row_height
+        self.fg = fg
+        self.font = font
+        self.selected = None
+        self.items = []
+
+        self.frame = tk.Frame(parent, bg=bg)
+        self.canvas = tk.Canvas(self.frame, bg=bg, highlightthickness=0,
+                                yscrollincrement=row_height)
+        self.scrollbar = tk.Scrollbar(self.frame, orient='vertical', command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self.on_scroll)
+        self.canvas.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+        self.highlight = self.canvas.create_rectangle(0, 0, 0, 0, fill=select_bg, width=0, state='hidden')
+
+        self.canvas.bind('<Configure>', lambda e: self.set_row_count(self.row_count))
+        self.canvas.bind('<Button-1>', self.click)
+        self.canvas.bind('<MouseWheel>', lambda e: self.canvas.yview_scroll(-1 if e.delta > 0 else 1, 'units'))
+        self.canvas.bind('<Button-4>', lambda e: self.canvas.yview_scroll(-1, 'units'))
+        self.canvas.bind('<Button-5>', lambda e: self.canvas.yview_scroll(1, 'units'))
+
+    def set_row_count(self, row_count):
+        self.row_count = row_count
+        width = self.canvas.winfo_width()
+        self.canvas.configure(scrollregion=(0, 0, width, row_count * self.row_height))
+        self.refresh()
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.refresh()
+
+    def refresh(self):
+        top = int(self.canvas.canvasy(0)) // self.row_height
+        visible = self.canvas.winfo_height() // self.row_height + 2
+        rows = range(top, min(self.row_count, top + visible))
+        while len(self.items) < len(rows):
+            self.items.append(self.canvas.create_text(10, 0, anchor='w', font=self.font, fill=self.fg))
+        for item, row in zip(self.items, rows):
+            text, color = self.row_text(row)
+            self.canvas.coords(item, 10, row * self.row_height + self.row_height // 2)
+            self.canvas.itemconfig(item, text=text, fill=color or self.fg, state='normal')
+        for item in self.items[len(rows):]:
+            self.canvas.itemconfig(item, state='hidden')
+        if self.selected is not None and self.selected in rows:
+            y = self.selected * self.row_height
+            self.canvas.coords(self.highlight, 0, y, self.canvas.winfo_width(), y + self.row_height)
+            self.canvas.itemconfig(self.highlight, state='normal')
+        else:
+            self.canvas.itemconfig(self.highlight, state='hidden')
+
+    def select(self, row):
+        self.selected = row
+        self.refresh()
+        if self.on_select:
+            self.on_select(row)
+
+    def click(self, event):
+        row = int(self.canvas.canvasy(event.y)) // self.row_height
+        if 0 <= row < self.row_count:
+            self.select(row)
+
 class TicTacToeGame:
-    def __init__(self, root):
+    def __init__(self, root, tt_size=50000, render_mode="fast"):
+        # render_mode "fast" reuses preallocated fonts and a one-image background,
+        # "classic" keeps the original per-frame font tuples and line-drawn gradient
         self.root = root
+        self.render_mode = render_mode
         self.root.title("Ultimate Tic Tac Toe")
         self.root.geometry("800x650")
         self.root.resizable(True, True)
@@ -33,19 +114,37 @@ class TicTacToeGame:
         
        
 
-        self.board = [['' for _ in range(3)] for _ in range(3)]
+        self.board = Board()
+        self.transposition_table = TranspositionTable(max_entries=tt_size)
+        self.search_table = TranspositionTable(max_entries=tt_size)
+        self.opening_book = load_book()
         self.buttons = []
         self.player_name = "Player"
         self.ai_name = "AI"
         self.current_player = 'X'
         self.scores = {'Player': 0, 'AI': 0, 'Draws': 0}
         self.history = []
+        self.move_times = []
+        self.game_started = time.time()
+        self.move_clock = time.perf_counter()
+        self.game_log = GameLog()
         self.settings_window = None
         self.game_history_window = None
         self.ai_difficulty = "Hard" 
         self.player_symbol = 'X'
         self.ai_symbol = 'O'
+        self.move_time = 1.0  # seconds per AI move on boards larger than 3x3
+        self.mcts = MCTSPlayer(iterations=20000, time_limit=self.move_time)
         self.animation_in_progress = False
+        self.ai_after_id = None
+        self.search_token = None
+        self.search_thread = None
+        self.search_results = queue.Queue()
+        # opt-in search profiling: stats are only collected while the overlay is shown or a hook is set
+        self.show_search_stats = False
+        self.profile_hook = None
+        self.last_search_stats = None
+        self.search_started = 0.0
         
        
 
@@ -63,7 +162,7 @@ class TicTacToeGame:
         self.update_status()
         
         if self.player_symbol == 'O':
-            self.root.after(500, self.ai_move)
+            self.schedule_ai_move()
 
     def create_gradient_background(self):
      
@@ -71,6 +170,14 @@ class TicTacToeGame:
         self.bg_canvas = tk.Canvas(self.root, width=800, height=650, highlightthickness=0)
         self.bg_canvas.place(x=0, y=0, relwidth=1, relheight=1)
         
+        if self.render_mode == "fast":
+            self.bg_image = None
+            self.bg_item = None
+            self.bg_size = None
+            self.bg_resize_id = None
+            self.paint_gradient(800, 650)
+            self.bg_canvas.bind("<Configure>", self.on_background_resize)
+            return
        
         for i in range(650):
             r = int(18 + (i/650)*10)
@@ -79,6 +186,32 @@ class TicTacToeGame:
             color = f'#{r:02x}{g:02x}{b:02x}'
             self.bg_canvas.create_line(0, i, 800, i, fill=color)
 
+    def paint_gradient(self, width, height):
+        # one pixel column with a single put(), stretched sideways by Tk into one canvas image
+        self.bg_resize_id = None
+        column = tk.PhotoImage(width=1, height=height)
+        rows = []
+        for i in range(height):
+            r = int(18 + (i/height)*10)
+            g = int(18 + (i/height)*10)
+            b = int(25 + (i/height)*20)
+            rows.append(f'{{#{r:02x}{g:02x}{b:02x}}}')
+        column.put(' '.join(rows))
+        self.bg_image = column.zoom(width, 1)
+        if self.bg_item is None:
+            self.bg_item = self.bg_canvas.create_image(0, 0, anchor='nw', image=self.bg_image)
+        else:
+            self.bg_canvas.itemconfig(self.bg_item, image=self.bg_image)
+        self.bg_size = (width, height)
+
+    def on_background_resize(self, event):
+        if (event.width, event.height) == self.bg_size or event.width < 2 or event.height < 2:
+            return
+        # repaint once the window stops changing size
+        if self.bg_resize_id:
+            self.root.after_cancel(self.bg_resize_id)
+        self.bg_resize_id = self.root.after(100, self.paint_gradient, event.width, event.height)
+
     def create_widgets(self):
         
         
@@ -96,6 +229,7 @@ class TicTacToeGame:
 
         status_frame = tk.Frame(self.root, bg='#16213e', bd=0, relief='flat')
         status_frame.pack(fill='x', padx=20, pady=(0, 15))
+        self.status_frame = status_frame
         self.status_label = tk.Label(status_frame, text="", font=self.status_font, 
                                    bg='#16213e', fg='#f9f9f9')
         self.status_label.pack(side='left', padx=20, pady=10)
@@ -103,23 +237,12 @@ class TicTacToeGame:
                                   bg='#16213e', fg='#f9f9f9')
         self.score_label.pack(side='right', padx=20, pady=10)
         self.update_scores()
-        board_frame = tk.Frame(self.root, bg='#0f3460', bd=0)
-        board_frame.pack(padx=20, pady=10)
-        self.buttons = []
-        for i in range(3):
-            row = []
-            for j in range(3):
-                cell_frame = tk.Frame(board_frame, bg='#0f3460', highlightbackground="#e94560", 
-                                     highlightthickness=1 if (i+j) % 2 == 0 else 2)
-                cell_frame.grid(row=i, column=j, padx=5, pady=5)
-                
-                btn = tk.Button(cell_frame, text='', font=self.cell_font, width=3, height=1,
-                               bg='#1a1a2e', fg='#f9f9f9', activebackground='#16213e',
-                               activeforeground='#f9f9f9', relief='flat',
-                               command=lambda i=i, j=j: self.human_move(i, j))
-                btn.pack(padx=5, pady=5)
-                row.append(btn)
-            self.buttons.append(row)
+        self.stats_label = tk.Label(self.root, text="", font=("Consolas", 10), 
+                                  bg='#16213e', fg='#95a5a6', anchor='w')
+        self.root.bind('<F3>', self.toggle_search_stats)
+        self.board_frame = tk.Frame(self.root, bg='#0f3460', bd=0)
+        self.board_frame.pack(padx=20, pady=10)
+        self.build_board()
         control_frame = tk.Frame(self.root, bg='#121212', bd=0)
         control_frame.pack(fill='x', padx=20, pady=20)
     
@@ -157,10 +280,41 @@ class TicTacToeGame:
         
         self.diff_var = tk.StringVar(value=self.ai_difficulty)
         diff_menu = ttk.Combobox(diff_frame, textvariable=self.diff_var, 
-                                values=["Easy", "Medium", "Hard"], width=8, state="readonly")
+                                values=["Easy", "Medium", "Hard", "MCTS"], width=8, state="readonly")
         diff_menu.pack(side='left')
         diff_menu.bind("<<ComboboxSelected>>", self.change_difficulty)
 
+    def build_board(self):
+        for child in self.board_frame.winfo_children():
+            child.destroy()
+
+        size = self.board.size
+        # shrink cells so that larger boards still fit the window
+        self.cell_font_size = min(48, 144 // size)
+        self.cell_font = ("Arial", self.cell_font_size, "bold")
+        self.animation_fonts = []
+        if self.render_mode == "fast":
+            # resolve every animation frame's font once instead of on each frame
+            self.cell_font = tkfont.Font(family="Arial", size=self.cell_font_size, weight="bold")
+            self.animation_fonts = [tkfont.Font(family="Arial", size=font_size)
+                                    for font_size in range(8, self.cell_font_size + 3, 3)]
+        pad = 5 if size <= 4 else 2
+        self.buttons = []
+        for i in range(size):
+            row = []
+            for j in range(size):
+                cell_frame = tk.Frame(self.board_frame, bg='#0f3460', highlightbackground="#e94560", 
+                                     highlightthickness=1 if (i+j) % 2 == 0 else 2)
+                cell_frame.grid(row=i, column=j, padx=pad, pady=pad)
+                
+                btn = tk.Button(cell_frame, text='', font=self.cell_font, width=3 if size <= 4 else 2, height=1,
+                               bg='#1a1a2e', fg='#f9f9f9', activebackground='#16213e',
+                               activeforeground='#f9f9f9', relief='flat',
+                               command=lambda i=i, j=j: self.human_move(i, j))
+                btn.pack(padx=pad, pady=pad)
+                row.append(btn)
+            self.buttons.append(row)
+
     def update_scores(self):
         score_text = f"{self.player_name}: {self.scores['Player']}   {self.ai_name}: {self.scores['AI']}   Draws: {self.scores['Draws']}"
         self.score_label.config(text=score_text)
@@ -181,15 +335,19 @@ class TicTacToeGame:
     def reset_game(self):
         if self.animation_in_progress:
             return
-        self.board = [['' for _ in range(3)] for _ in range(3)]
-        for i in range(3):
-            for j in range(3):
+        self.cancel_search()
+        self.board.clear()
+        for i in range(self.board.size):
+            for j in range(self.board.size):
                 self.buttons[i][j].config(text='', state='normal', bg='#1a1a2e')
         self.current_player = self.player_symbol
         self.update_status()
         self.history = []
+        self.move_times = []
+        self.game_started = time.time()
+        self.move_clock = time.perf_counter()
         if self.player_symbol == 'O':
-            self.root.after(500, self.ai_move)
+            self.schedule_ai_move()
 
     def open_settings(self):
         if self.settings_window and tk.Toplevel.winfo_exists(self.settings_window):
@@ -198,7 +356,7 @@ class TicTacToeGame:
 
         self.settings_window = tk.Toplevel(self.root)
         self.settings_window.title("Game Settings")
-        self.settings_window.geometry("400x350")
+        self.settings_window.geometry("400x500")
         self.settings_window.configure(bg='#1a1a2e')
         self.settings_window.resizable(False, False)
         self.settings_window.grab_set()
@@ -234,6 +392,22 @@ class TicTacToeGame:
                       value='O', bg='#1a1a2e', fg='#f9f9f9', selectcolor='#16213e',
                       font=("Arial", 11)).pack(side='left')
         
+        tk.Label(settings_frame, text="Board:", bg='#1a1a2e', fg='#f9f9f9', 
+                font=("Arial", 12)).pack(anchor='w', pady=5)
+        
+        board_frame = tk.Frame(settings_frame, bg='#1a1a2e')
+        board_frame.pack(fill='x', pady=(0, 15))
+        
+        self.board_var = tk.StringVar(value=self.board_label(self.board.size, self.board.win_length))
+        ttk.Combobox(board_frame, textvariable=self.board_var, width=18, state="readonly",
+                     values=[self.board_label(size, k) for size, k in BOARD_PRESETS]).pack(side='left')
+        
+        tk.Label(board_frame, text="AI time (s):", bg='#1a1a2e', fg='#f9f9f9', 
+                font=("Arial", 11)).pack(side='left', padx=(15, 5))
+        self.move_time_var = tk.DoubleVar(value=self.move_time)
+        tk.Spinbox(board_frame, from_=0.2, to=10.0, increment=0.2, width=5,
+                   textvariable=self.move_time_var).pack(side='left')
+        
         sound_frame = tk.Frame(settings_frame, bg='#1a1a2e')
         sound_frame.pack(fill='x', pady=(0, 20))
         
@@ -241,6 +415,11 @@ class TicTacToeGame:
         tk.Checkbutton(sound_frame, text="Enable Sound", variable=self.sound_var, 
                       bg='#1a1a2e', fg='#f9f9f9', selectcolor='#16213e',
                       font=("Arial", 11)).pack(anchor='w')
+        
+        self.stats_var = tk.BooleanVar(value=self.show_search_stats)
+        tk.Checkbutton(sound_frame, text="Show search stats (F3)", variable=self.stats_var, 
+                      bg='#1a1a2e', fg='#f9f9f9', selectcolor='#16213e',
+                      font=("Arial", 11)).pack(anchor='w')
   
 
 
@@ -250,6 +429,9 @@ class TicTacToeGame:
                             command=self.apply_settings)
         apply_btn.pack(pady=15)
 
+    def board_label(self, size, win_length):
+        return f"{size}x{size}, {win_length} in a row"
+
     def center_window(self, window):
         window.update_idletasks()
         width = window.winfo_width()
@@ -259,12 +441,28 @@ class TicTacToeGame:
         window.geometry(f'+{x}+{y}')
 
     def apply_settings(self):
+        self.cancel_search()
         self.player_name = self.name_entry.get().strip() or "Player"
         self.player_symbol = self.symbol_var.get()
         self.ai_symbol = 'O' if self.player_symbol == 'X' else 'X'
         
         global SOUND_ENABLED
         SOUND_ENABLED = self.sound_var.get()
+        self.set_search_stats(self.stats_var.get())
+        
+        try:
+            self.move_time = max(0.2, float(self.move_time_var.get()))
+            self.mcts.time_limit = self.move_time
+        except (tk.TclError, ValueError):
+            pass
+        
+        for size, win_length in BOARD_PRESETS:
+            if self.board_var.get() == self.board_label(size, win_length):
+                if (size, win_length) != (self.board.size, self.board.win_length):
+                    self.board = Board(size, win_length)
+                    self.search_table.clear()
+                    self.build_board()
+                break
         
         self.update_scores()
         self.update_status()
@@ -278,43 +476,148 @@ class TicTacToeGame:
         if self.animation_in_progress:
             return
             
-        if self.board[i][j] == '' and self.current_player == self.player_symbol:
+        if self.board.is_empty(i, j) and self.current_player == self.player_symbol:
             self.play_move(i, j, self.player_symbol)
             if not self.check_game_end(self.player_symbol):
                 self.current_player = self.ai_symbol
                 self.update_status()
-                self.root.after(500, self.ai_move)
+                self.schedule_ai_move()
+
+    def schedule_ai_move(self):
+        self.ai_after_id = self.root.after(500, self.ai_move)
+
+    def cancel_search(self):
+        if self.ai_after_id:
+            self.root.after_cancel(self.ai_after_id)
+            self.ai_after_id = None
+        if self.search_token:
+            self.search_token.cancel()
+            self.search_token = None
+
+    def toggle_search_stats(self, event=None):
+        self.set_search_stats(not self.show_search_stats)
+
+    def set_search_stats(self, show):
+        self.show_search_stats = show
+        if show:
+            self.stats_label.pack(fill='x', padx=20, pady=(0, 10), after=self.status_frame)
+            if self.last_search_stats:
+                self.stats_label.config(text=self.last_search_stats.summary())
+        else:
+            self.stats_label.pack_forget()
 
     def ai_move(self):
+        self.ai_after_id = None
         if self.animation_in_progress:
             return
-        if self.ai_difficulty == "Easy":
+        # search on a copy in a worker thread so the window keeps redrawing and responding
+        token = CancelToken()
+        self.search_token = token
+        self.search_started = time.perf_counter()
+        stats = SearchStats() if self.show_search_stats or self.profile_hook else None
+        self.search_thread = threading.Thread(
+            target=self.search_worker,
+            args=(token, self.board.copy(), self.ai_difficulty, self.search_thread, stats),
+            daemon=True)
+        self.search_thread.start()
+        self.root.after(20, self.poll_search, token)
+
+    def search_worker(self, token, board, difficulty, previous, stats):
+        # a cancelled search stops within a few hundred nodes; wait for it so the
+        # transposition tables are only ever used by one search at a time
+        if previous:
+            previous.join()
+        start = time.perf_counter()
+        try:
+            if difficulty == "Easy":
+                move = self.random_move(board)
+            elif difficulty == "Medium":
+                move = self.medium_move(board, token, stats)
+            elif difficulty == "MCTS":
+                move = self.mcts_move(board, token, stats)
+            else:  # Hard
+                move = self.best_move(board, token, stats)
+        except SearchCancelled:
+            return
+        except Exception as e:
+            # handed to poll_search, which would otherwise wait for a move that never comes
+            self.search_results.put((token, e, stats))
+            return
+        if stats:
+            stats.search_time = time.perf_counter() - start
+        self.search_results.put((token, move, stats))
+
+    def poll_search(self, token):
+        if token.cancelled:
+            return
+        try:
+            result_token, move, stats = self.search_results.get_nowait()
+        except queue.Empty:
+            self.root.after(20, self.poll_search, token)
+            return
+        if result_token is not token:
+            # left over from a search that was cancelled after it finished
+            self.root.after(20, self.poll_search, token)
+            return
+        self.search_token = None
+        if isinstance(move, Exception):
+            print(f"AI search failed: {move!r}; playing a random move")
             move = self.random_move()
-        elif self.ai_difficulty == "Medium":
-            move = self.medium_move()
-        else:  # Hard
-            _, move = self.minimax(self.board, True, -float('inf'), float('inf'))
-            
+        elif stats:
+            self.report_search_stats(stats)
         if move:
             self.play_move(*move, self.ai_symbol)
             if not self.check_game_end(self.ai_symbol):
                 self.current_player = self.player_symbol
                 self.update_status()
 
-    def random_move(self):
-        empty_cells = [(i, j) for i in range(3) for j in range(3) if self.board[i][j] == '']
+    def report_search_stats(self, stats):
+        # move_time covers the whole ai_move, so a gap to search_time is queueing and GUI overhead
+        self.last_search_stats = stats
+        move_time = time.perf_counter() - self.search_started
+        if self.show_search_stats:
+            self.stats_label.config(text=f"{stats.summary()}  move {move_time * 1000:.1f} ms")
+        if self.profile_hook:
+            self.profile_hook(stats, move_time)
+
+    def best_move(self, board=None, cancel=None, stats=None):
+        if board is None:
+            board = self.board
+        # perfect play straight from the precomputed book, searching only if it is missing
+        if self.opening_book:
+            move = self.opening_book.lookup(board, self.ai_symbol)
+            if move:
+                return move
+        if board.size == 3 and board.win_length == 3:
+            _, move = self.minimax(board, True, -float('inf'), float('inf'), cancel, stats)
+            return move
+        # full-depth minimax cannot finish on larger boards, so search within the time budget
+        return search(board, self.ai_symbol, self.player_symbol, self.move_time,
+                      table=self.search_table, cancel=cancel, stats=stats)
+
+    def mcts_move(self, board=None, cancel=None, stats=None):
+        if board is None:
+            board = self.board
+        return self.mcts.choose_move(board, self.ai_symbol, self.player_symbol, cancel, stats)
+
+    def random_move(self, board=None):
+        if board is None:
+            board = self.board
+        empty_cells = board.empty_cells()
         return random.choice(empty_cells) if empty_cells else None
 
-    def medium_move(self):
+    def medium_move(self, board=None, cancel=None, stats=None):
         # Medium difficulty: sometimes makes optimal moves, sometimes random
         if random.random() < 0.7:  # 70% chance to make optimal move
-            _, move = self.minimax(self.board, True, -float('inf'), float('inf'))
-            return move
-        return self.random_move()
+            return self.best_move(board, cancel, stats)
+        return self.random_move(board)
 
     def play_move(self, i, j, player):
-        self.board[i][j] = player
+        self.board.place(i, j, player)
         self.history.append((player, i, j))
+        now = time.perf_counter()
+        self.move_times.append(now - self.move_clock)
+        self.move_clock = now
         
         # Animation effect
         self.animate_move(i, j, player)
@@ -327,14 +630,17 @@ class TicTacToeGame:
         
         # Animation parameters
         size = 5
+        target = self.cell_font_size
         step = 0
         color = '#2ecc71' if player == self.player_symbol else '#e94560'
+        fonts = self.animation_fonts
         
         def grow():
             nonlocal size, step
-            if size < 48:
+            if size < target:
                 size += 3
-                btn.config(font=("Arial", size))
+                btn.config(font=fonts[step] if fonts else ("Arial", size))
+                step += 1
                 btn.after(10, grow)
             else:
                 btn.config(text=player, font=self.cell_font, fg=color)
@@ -366,19 +672,34 @@ class TicTacToeGame:
                 pass
 
     def check_game_end(self, player):
-        if self.check_winner(self.board, player):
+        _, i, j = self.history[-1]
+        # only the lines through the last move can have been completed by it
+        if self.board.wins_at(i * self.board.size + j, player):
             winner_name = self.player_name if player == self.player_symbol else self.ai_name
             self.scores['Player' if player == self.player_symbol else 'AI'] += 1
+            self.record_game('player' if player == self.player_symbol else 'ai')
             self.show_result(f"{winner_name} wins!")
             self.play_win_sound()
             return True
         elif self.is_draw(self.board):
             self.scores['Draws'] += 1
+            self.record_game('draw')
             self.show_result("It's a draw!")
             self.play_draw_sound()
             return True
         return False
 
+    def current_record(self, result=None):
+        return GameRecord(list(self.history), result, self.ai_difficulty, self.player_symbol,
+                          self.board.size, self.board.win_length, self.game_started,
+                          time.time() - self.game_started, list(self.move_times))
+
+    def record_game(self, result):
+        try:
+            self.game_log.append(self.current_record(result))
+        except (OSError, ValueError) as e:
+            print(f"Could not save game: {e}")
+
     def play_win_sound(self):
         if not SOUND_ENABLED:
             return
@@ -432,33 +753,10 @@ class TicTacToeGame:
                  command=self.root.quit).pack(side='left', padx=10)
 
     def highlight_winning_line(self):
-        # Check for winning lines and highlight them
-        board = self.board
-        
-        # Check rows
-        for i in range(3):
-            if board[i][0] == board[i][1] == board[i][2] != '':
-                for j in range(3):
-                    self.buttons[i][j].config(bg='#34495e')
-                return
-                
-        # Check columns
-        for j in range(3):
-            if board[0][j] == board[1][j] == board[2][j] != '':
-                for i in range(3):
-                    self.buttons[i][j].config(bg='#34495e')
-                return
-                
-        # Check diagonals
-        if board[0][0] == board[1][1] == board[2][2] != '':
-            for i in range(3):
-                self.buttons[i][i].config(bg='#34495e')
-            return
-            
-        if board[0][2] == board[1][1] == board[2][0] != '':
-            for i in range(3):
-                self.buttons[i][2-i].config(bg='#34495e')
-            return
+        line = self.board.winning_line()
+        if line:
+            for i, j in line:
+                self.buttons[i][j].config(bg='#34495e')
 
     def disable_board(self):
         for row in self.buttons:
@@ -466,67 +764,14 @@ class TicTacToeGame:
                 btn['state'] = 'disabled'
 
     def check_winner(self, board, player):
-        # Check rows
-        for i in range(3):
-            if all(board[i][j] == player for j in range(3)):
-                return True
-                
-        # Check columns
-        for j in range(3):
-            if all(board[i][j] == player for i in range(3)):
-                return True
-                
-        # Check diagonals
-        if all(board[i][i] == player for i in range(3)):
-            return True
-            
-        if all(board[i][2-i] == player for i in range(3)):
-            return True
-            
-        return False
+        return board.is_win(player)
 
     def is_draw(self, board):
-        return all(board[i][j] != '' for i in range(3) for j in range(3))
-
-    def minimax(self, board, is_max, alpha, beta):
-        if self.check_winner(board, self.ai_symbol):
-            return 1, None
-        if self.check_winner(board, self.player_symbol):
-            return -1, None
-        if self.is_draw(board):
-            return 0, None
-
-        best_move = None
-        if is_max:
-            max_eval = -float('inf')
-            for i in range(3):
-                for j in range(3):
-                    if board[i][j] == '':
-                        board[i][j] = self.ai_symbol
-                        eval, _ = self.minimax(board, False, alpha, beta)
-                        board[i][j] = ''
-                        if eval > max_eval:
-                            max_eval = eval
-                            best_move = (i, j)
-                        alpha = max(alpha, eval)
-                        if beta <= alpha:
-                            break
-            return max_eval, best_move
-        else:
-            min_eval = float('inf')
-            for i in range(3):
-                for j in range(3):
-                    if board[i][j] == '':
-                        board[i][j] = self.player_symbol
-                        eval, _ = self.minimax(board, True, alpha, beta)
-                        board[i][j] = ''
-                        if eval < min_eval:
-                            min_eval = eval
-                            best_move = (i, j)
-                        beta = min(beta, eval)
-                        if beta <= alpha:
-                            break
-            return min_eval, best_move
+        return board.is_full()
+
+    def minimax(self, board, is_max, alpha, beta, cancel=None, stats=None):
+        return minimax(board, self.ai_symbol, self.player_symbol, is_max, alpha, beta,
+                       self.transposition_table, cancel=cancel, stats=stats)
 
     def show_history(self):
         if self.game_history_window and tk.Toplevel.winfo_exists(self.game_history_window):
@@ -535,55 +780,132 @@ class TicTacToeGame:
 
         self.game_history_window = tk.Toplevel(self.root)
         self.game_history_window.title("Game History")
-        self.game_history_window.geometry("500x400")
+        self.game_history_window.geometry("760x520")
         self.game_history_window.configure(bg='#1a1a2e')
-        self.game_history_window.resizable(False, False)
         self.center_window(self.game_history_window)
         
         # Title
         tk.Label(self.game_history_window, text="Game History", font=("Arial", 18, "bold"), 
                 bg='#1a1a2e', fg='#e94560').pack(pady=10)
         
-        # History list
-        history_frame = tk.Frame(self.game_history_window, bg='#16213e')
-        history_frame.pack(fill='both', expand=True, padx=20, pady=10)
+        body = tk.Frame(self.game_history_window, bg='#1a1a2e')
+        body.pack(fill='both', expand=True, padx=20, pady=(0, 15))
         
-        # Create a canvas and scrollbar
-        canvas = tk.Canvas(history_frame, bg='#16213e', highlightthickness=0)
-        scrollbar = tk.Scrollbar(history_frame, orient='vertical', command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg='#16213e')
-        
-        # Fixed the parenthesis issue here
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
+        try:
+            stored = len(self.game_log)
+        except (OSError, ValueError):
+            stored = 0
+        # row 0 is the game in progress, if any; stored games follow newest first
+        current = 1 if self.history else 0
+        record_cache = {}
+        
+        def record_at(row):
+            if row < current:
+                return self.current_record()
+            number = stored - 1 - (row - current)
+            if number not in record_cache:
+                if len(record_cache) > 256:
+                    record_cache.clear()
+                try:
+                    record_cache[number] = self.game_log.read(number)
+                except (OSError, ValueError):
+                    record_cache[number] = None  # listed as unreadable rather than failing the window
+            return record_cache[number]
+        
+        def game_text(row):
+            record = record_at(row)
+            if record is None:
+                return "(this game could not be read)", '#7f8c8d'
+            if record.result is None:
+                outcome, color = "in progress", '#f9f9f9'
+            elif record.result == 'draw':
+                outcome, color = "draw", '#f1c40f'
+            elif record.result == 'player':
+                outcome, color = f"{self.player_name} won", '#2ecc71'
+            else:
+                outcome, color = f"{self.ai_name} won", '#e94560'
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(record.started))
+            return (f"{when}  {record.size}x{record.size}  {record.difficulty:6}  {outcome:14}  "
+                    f"{len(record.moves)} moves  {record.duration:.0f}s", color)
+        
+        if not current + stored:
+            tk.Label(body, text="No moves recorded yet", 
+                    font=("Arial", 12), bg='#1a1a2e', fg='#f9f9f9').pack(pady=20)
+            return
         
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        games = VirtualList(body, current + stored, game_text, font=("Consolas", 10))
+        games.frame.pack(side='left', fill='both', expand=True)
+        
+        replay_frame = tk.Frame(body, bg='#1a1a2e')
+        replay_frame.pack(side='right', fill='y', padx=(15, 0))
+        replay_canvas = tk.Canvas(replay_frame, width=220, height=220, bg='#0f3460', highlightthickness=0)
+        replay_canvas.pack()
+        step_label = tk.Label(replay_frame, text="", font=("Arial", 11), bg='#1a1a2e', fg='#f9f9f9')
+        step_label.pack(pady=5)
+        controls = tk.Frame(replay_frame, bg='#1a1a2e')
+        controls.pack()
+        
+        replay = {'record': None, 'step': 0}
+        
+        def move_text(row):
+            record = replay['record']
+            player, i, j = record.moves[row]
+            player_name = self.player_name if player == record.player_symbol else self.ai_name
+            color = '#2ecc71' if player == record.player_symbol else '#e94560'
+            return (f"Move {row + 1}: {player_name} placed {player} at ({i+1}, {j+1})  "
+                    f"{record.move_times[row]:.1f}s", color)
+        
+        moves = VirtualList(replay_frame, 0, move_text, on_select=lambda row: show_step(row + 1))
+        moves.frame.pack(fill='both', expand=True, pady=(10, 0))
+        
+        def show_step(step):
+            record = replay['record']
+            if record is None:
+                return
+            step = max(0, min(len(record.moves), step))
+            replay['step'] = step
+            replay_canvas.delete('all')
+            cell = 220 / record.size
+            for k in range(1, record.size):
+                replay_canvas.create_line(k * cell, 0, k * cell, 220, fill='#e94560')
+                replay_canvas.create_line(0, k * cell, 220, k * cell, fill='#e94560')
+            for number, (player, i, j) in enumerate(record.moves[:step]):
+                color = '#2ecc71' if player == record.player_symbol else '#e94560'
+                if number == step - 1:
+                    replay_canvas.create_rectangle(j * cell, i * cell, (j + 1) * cell, (i + 1) * cell,
+                                                   fill='#34495e', width=0)
+                replay_canvas.create_text((j + 0.5) * cell, (i + 0.5) * cell, text=player, fill=color,
+                                          font=("Arial", max(10, int(cell * 0.5)), "bold"))
+            step_label.config(text=f"Move {step} / {len(record.moves)}")
+            moves.selected = step - 1 if step else None
+            moves.refresh()
+        
+        def select_game(row):
+            replay['record'] = record_at(row)
+            if replay['record'] is None:
+                replay_canvas.delete('all')
+                step_label.config(text="")
+                moves.set_row_count(0)
+                return
+            moves.set_row_count(len(replay['record'].moves))
+            show_step(len(replay['record'].moves))
         
-        canvas.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        for text, command in (("|<", lambda: show_step(0)),
+                              ("<", lambda: show_step(replay['step'] - 1)),
+                              (">", lambda: show_step(replay['step'] + 1)),
+                              (">|", lambda: show_step(len(replay['record'].moves)) if replay['record'] else None)):
+            tk.Button(controls, text=text, font=("Arial", 10), width=3, bg='#2c2c54', fg='#f9f9f9',
+                     relief='flat', command=command).pack(side='left', padx=2)
         
-        # Display history
-        if not self.history:
-            tk.Label(scrollable_frame, text="No moves recorded yet", 
-                    font=("Arial", 12), bg='#16213e', fg='#f9f9f9').pack(pady=20)
-            return
-            
-        for idx, move in enumerate(self.history, 1):
-            player, i, j = move
-            player_name = self.player_name if player == self.player_symbol else self.ai_name
-            move_text = f"Move {idx}: {player_name} placed {player} at ({i+1}, {j+1})"
-            
-            move_frame = tk.Frame(scrollable_frame, bg='#16213e', padx=10, pady=5)
-            move_frame.pack(fill='x', pady=2)
-            
-            color = '#2ecc71' if player == self.player_symbol else '#e94560'
-            tk.Label(move_frame, text=move_text, font=("Arial", 11), 
-                    bg='#16213e', fg=color, anchor='w').pack(side='left')
+        games.on_select = select_game
+        self.game_history_window.bind('<Left>', lambda e: show_step(replay['step'] - 1))
+        self.game_history_window.bind('<Right>', lambda e: show_step(replay['step'] + 1))
+        games.select(0)
 
 if __name__ == '__main__':
     root = tk.Tk()
     game = TicTacToeGame(root)
-    root.mainloop()
\ No newline at end of file
+    try:
+        root.mainloop()
+    finally:
+        game.mcts.close()
\ No newline at end of file
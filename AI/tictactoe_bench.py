@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from tictactoe_engine import Board, SearchStats, TranspositionTable, minimax, search
+from tictactoe_book import load_book
+from tictactoe_mcts import MCTSPlayer
+
+
+class RandomStrategy:
+    def __init__(self, options):
+        pass
+
+    def choose_move(self, board, me, opponent, stats):
+        return random.choice(board.empty_cells())
+
+
+class MinimaxStrategy:
+    # plain full-depth minimax without book or table, the baseline the other engines are held to
+    def __init__(self, options):
+        pass
+
+    def choose_move(self, board, me, opponent, stats):
+        if board.size != 3 or board.win_length != 3:
+            raise ValueError("full minimax only runs on the 3x3 board")
+        _, move = minimax(board, me, opponent, True, -float('inf'), float('inf'), stats=stats)
+        return move
+
+
+class HardStrategy:
+    # what the game plays on Hard: book, then minimax with a table, then the timed search
+    def __init__(self, options):
+        self.book = None if options.no_book else load_book()
+        self.table = TranspositionTable()
+        self.search_table = TranspositionTable()
+        self.move_time = options.move_time
+
+    def choose_move(self, board, me, opponent, stats):
+        if self.book:
+            move = self.book.lookup(board, me)
+            if move:
+                return move
+        if board.size == 3 and board.win_length == 3:
+            _, move = minimax(board, me, opponent, True, -float('inf'), float('inf'), self.table, stats=stats)
+            return move
+        return search(board, me, opponent, self.move_time, table=self.search_table, stats=stats)
+
+
+class MediumStrategy(HardStrategy):
+    def choose_move(self, board, me, opponent, stats):
+        if random.random() < 0.7:
+            return HardStrategy.choose_move(self, board, me, opponent, stats)
+        return random.choice(board.empty_cells())
+
+
+class SearchStrategy:
+    def __init__(self, options):
+        self.table = TranspositionTable()
+        self.move_time = options.move_time
+
+    def choose_move(self, board, me, opponent, stats):
+        return search(board, me, opponent, self.move_time, table=self.table, stats=stats)
+
+
+class MCTSStrategy:
+    def __init__(self, options):
+        # games already run one per process, so each tree stays in its own process
+        self.player = MCTSPlayer(iterations=options.mcts_iterations, time_limit=options.move_time, workers=1)
+
+    def choose_move(self, board, me, opponent, stats):
+        return self.player.choose_move(board, me, opponent, stats=stats)
+
+
+STRATEGIES = {
+    'random': RandomStrategy,
+    'medium': MediumStrategy,
+    'minimax': MinimaxStrategy,
+    'hard': HardStrategy,
+    'search': SearchStrategy,
+    'mcts': MCTSStrategy,
+}
+
+_players = None
+
+
+def _init_worker(labels, options):
+    # labels map each side's report name to its strategy; they differ even in self-play
+    global _players
+    _players = {label: STRATEGIES[name](options) for label, name in labels.items()}
+
+
+def play_game(x_label, o_label, size, win_length):
+    # returns the winning label (or None) and one (label, nodes, seconds) per move
+    board = Board(size, win_length)
+    sides = {'X': x_label, 'O': o_label}
+    symbol, other = 'X', 'O'
+    moves = []
+    while True:
+        stats = SearchStats()
+        start = time.perf_counter()
+        i, j = _players[sides[symbol]].choose_move(board, symbol, other, stats)
+        moves.append((sides[symbol], stats.nodes, time.perf_counter() - start))
+        board.place(i, j, symbol)
+        if board.wins_at(i * size + j, symbol):
+            return sides[symbol], moves
+        if board.is_full():
+            return None, moves
+        symbol, other = other, symbol
+
+
+def _play_one(task):
+    # every game is seeded from --seed and its number, so a run repeats whichever worker plays it
+    *game, seed = task
+    random.seed(seed)
+    return play_game(*game)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarise(labels, results):
+    report = {}
+    games = len(results)
+    draws = sum(1 for winner, _ in results if winner is None)
+    for label in labels:
+        nodes = [n for _, moves in results for who, n, _ in moves if who == label]
+        latencies = [t for _, moves in results for who, _, t in moves if who == label]
+        wins = sum(1 for winner, _ in results if winner == label)
+        losses = games - wins - draws
+        report[label] = {
+            'games': games,
+            'wins': wins,
+            'draws': draws,
+            'losses': losses,
+            'win_rate': round(wins / games, 4),
+            'draw_rate': round(draws / games, 4),
+            'loss_rate': round(losses / games, 4),
+            'moves': len(latencies),
+            'nodes_per_move': round(sum(nodes) / len(nodes), 1) if nodes else 0,
+            'latency_p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'latency_p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless self-play tournament between tic-tac-toe AIs")
+    parser.add_argument('first', choices=sorted(STRATEGIES))
+    parser.add_argument('second', choices=sorted(STRATEGIES))
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--size', type=int, default=3)
+    parser.add_argument('--win-length', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--move-time', type=float, default=0.2, help="seconds per move for search and mcts")
+    parser.add_argument('--mcts-iterations', type=int, default=2000)
+    parser.add_argument('--no-book', action='store_true', help="make hard and medium search every move")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help="write the report here, '-' for stdout")
+    parser.add_argument('--unbeaten', action='append', default=[], metavar='NAME',
+                        help="exit with status 1 if this strategy loses a game (NAME-2 for the second side in self-play)")
+    args = parser.parse_args(argv)
+
+    first = args.first
+    second = args.second if args.second != args.first else f"{args.second}-2"
+    labels = {first: args.first, second: args.second}
+    win_length = args.win_length or args.size
+    # alternate who moves first so neither side keeps the first-move advantage
+    tasks = [(first, second, args.size, win_length, f"{args.seed}:{game}") if game % 2 == 0
+             else (second, first, args.size, win_length, f"{args.seed}:{game}") for game in range(args.games)]
+
+    start = time.perf_counter()
+    if args.workers <= 1:
+        _init_worker(labels, args)
+        results = [_play_one(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(labels, args)) as executor:
+            results = list(executor.map(_play_one, tasks, chunksize=max(1, len(tasks) // (args.workers * 8))))
+    elapsed = time.perf_counter() - start
+
+    report = {
+        'first': args.first,
+        'second': args.second,
+        'board': f"{args.size}x{args.size}/{win_length}",
+        'games': args.games,
+        'move_time': args.move_time,
+        'strategies': summarise(labels, results),
+    }
+    if args.json:
+        text = json.dumps(report, indent=2, sort_keys=True)
+        if args.json == '-':
+            print(text)
+        else:
+            with open(args.json, 'w') as f:
+                f.write(text + '\n')
+    for name, row in report['strategies'].items():
+        print(f"{name:9} win {row['win_rate']:.1%}  draw {row['draw_rate']:.1%}  loss {row['loss_rate']:.1%}  "
+              f"nodes/move {row['nodes_per_move']:>9}  p50 {row['latency_p50_ms']:.3f} ms  "
+              f"p99 {row['latency_p99_ms']:.3f} ms", file=sys.stderr)
+    print(f"{args.games} games in {elapsed:.1f}s", file=sys.stderr)
+
+    beaten = [name for name in args.unbeaten if report['strategies'].get(name, {}).get('losses')]
+    if beaten:
+        print(f"lost at least one game: {', '.join(beaten)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
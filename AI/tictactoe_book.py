@@ -0,0 +1,149 @@
+import argparse
+import os
+import sys
+
+from tictactoe_engine import SIZE, Board, TranspositionTable, minimax
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tictactoe_book.bin')
+MAGIC = b'TTB1'
+CELLS = SIZE * SIZE
+POSITIONS = 3 ** CELLS
+
+# _BASE3[mask] is the base-3 weight of every cell set in mask, so a position code
+# is _BASE3[x] + 2 * _BASE3[o]
+_BASE3 = [sum(3 ** index for index in range(CELLS) if mask >> index & 1) for mask in range(1 << CELLS)]
+
+
+def position_code(board):
+    return _BASE3[board.masks['X']] + 2 * _BASE3[board.masks['O']]
+
+
+def side_to_move(board):
+    return 'X' if bin(board.masks['X']).count('1') == bin(board.masks['O']).count('1') else 'O'
+
+
+def reachable_positions():
+    # every position reachable from the empty board with X moving first, terminal ones included
+    seen = set()
+    board = Board()
+    stack = [(0, 0)]
+    while stack:
+        x, o = stack.pop()
+        if (x, o) in seen:
+            continue
+        seen.add((x, o))
+        board.masks = {'X': x, 'O': o}
+        if board.is_win('X') or board.is_win('O') or board.is_full():
+            continue
+        symbol = side_to_move(board)
+        for index in board.empty_indices():
+            if symbol == 'X':
+                stack.append((x | 1 << index, o))
+            else:
+                stack.append((x, o | 1 << index))
+    return seen
+
+
+def _encode(value, move):
+    # high nibble is value + 1 (0..2), low nibble is move index + 1 (1..9); 0 marks no entry
+    i, j = move
+    return (value + 1) << 4 | (i * SIZE + j + 1)
+
+
+def _decode(entry):
+    if not entry:
+        return None
+    return (entry >> 4) - 1, divmod((entry & 0x0F) - 1, SIZE)
+
+
+def build():
+    table = bytearray(POSITIONS)
+    tt = TranspositionTable(max_entries=POSITIONS)
+    board = Board()
+    for x, o in reachable_positions():
+        board.masks = {'X': x, 'O': o}
+        if board.is_win('X') or board.is_win('O') or board.is_full():
+            continue
+        me = side_to_move(board)
+        opponent = 'O' if me == 'X' else 'X'
+        value, move = minimax(board, me, opponent, True, -float('inf'), float('inf'), tt)
+        table[position_code(board)] = _encode(value, move)
+    return bytes(table)
+
+
+def verify(data):
+    # the book must agree with a live, table-free minimax on every reachable position
+    book = OpeningBook(data)
+    board = Board()
+    checked = 0
+    for x, o in reachable_positions():
+        board.masks = {'X': x, 'O': o}
+        if board.is_win('X') or board.is_win('O') or board.is_full():
+            continue
+        me = side_to_move(board)
+        opponent = 'O' if me == 'X' else 'X'
+        value, _ = minimax(board, me, opponent, True, -float('inf'), float('inf'))
+        entry = book.entry(board)
+        if entry is None:
+            raise ValueError(f"missing book entry for position {position_code(board)}")
+        book_value, (i, j) = entry
+        if book_value != value or not board.is_empty(i, j):
+            raise ValueError(f"bad book entry for position {position_code(board)}")
+        board.place(i, j, me)
+        reply_value, _ = minimax(board, me, opponent, False, -float('inf'), float('inf'))
+        if reply_value != value:
+            raise ValueError(f"book move does not keep value {value} at position {position_code(board)}")
+        checked += 1
+    return checked
+
+
+class OpeningBook:
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def load(cls, path=BOOK_PATH):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        if raw[:len(MAGIC)] != MAGIC or len(raw) != len(MAGIC) + POSITIONS:
+            raise ValueError(f"{path} is not a tic-tac-toe book")
+        return cls(raw[len(MAGIC):])
+
+    def entry(self, board):
+        return _decode(self.data[position_code(board)])
+
+    def lookup(self, board, symbol):
+        # best move for symbol, or None when the book cannot answer for this position
+        if board.size != SIZE or board.win_length != SIZE or side_to_move(board) != symbol:
+            return None
+        entry = self.entry(board)
+        return entry[1] if entry else None
+
+
+def load_book(path=BOOK_PATH):
+    try:
+        return OpeningBook.load(path)
+    except (OSError, ValueError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the perfect-play tic-tac-toe book")
+    parser.add_argument('--output', default=BOOK_PATH)
+    parser.add_argument('--verify-only', action='store_true', help="check an existing book against minimax")
+    args = parser.parse_args(argv)
+
+    if args.verify_only:
+        data = OpeningBook.load(args.output).data
+    else:
+        data = build()
+    checked = verify(data)
+    if not args.verify_only:
+        with open(args.output, 'wb') as f:
+            f.write(MAGIC + data)
+    print(f"{checked} positions verified, book at {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,519 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+SIZE = 3
+WIN_SCORE = 1000000
+# boards with more cells than this only consider moves next to existing pieces
+FULL_WIDTH_CELLS = 16
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+class SearchStats:
+    # Work done by one or more searches; pass the same instance to accumulate.
+    # Depths are counted in plies below the root of each search.
+    def __init__(self):
+        self.nodes = 0
+        self.cutoffs = {}  # depth -> alpha-beta cutoffs
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.interior = 0  # nodes whose children were searched
+        self.children = 0
+        self.depth = 0  # deepest completed iteration of the timed search
+        self.search_time = 0.0
+        self.root_pieces = 0
+
+    def cutoff(self, depth):
+        self.cutoffs[depth] = self.cutoffs.get(depth, 0) + 1
+
+    @property
+    def branching_factor(self):
+        return self.children / self.interior if self.interior else 0.0
+
+    def as_dict(self):
+        return {
+            'nodes': self.nodes,
+            'cutoffs': dict(sorted(self.cutoffs.items())),
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'branching_factor': round(self.branching_factor, 2),
+            'depth': self.depth,
+            'search_time': self.search_time,
+        }
+
+    def summary(self):
+        cutoffs = ' '.join(f"d{depth}:{count}" for depth, count in sorted(self.cutoffs.items())[:4])
+        return (f"nodes {self.nodes}  cuts {cutoffs or '-'}  tt {self.tt_hits}/{self.tt_probes}  "
+                f"bf {self.branching_factor:.1f}  search {self.search_time * 1000:.1f} ms")
+
+
+class CancelToken:
+    # Shared between the UI and a search; the search polls it and stops with SearchCancelled.
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise SearchCancelled()
+
+
+def _line_masks(size, win_length):
+    lines = []
+    for i in range(size):
+        for j in range(size):
+            for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_i = i + di * (win_length - 1)
+                end_j = j + dj * (win_length - 1)
+                if 0 <= end_i < size and 0 <= end_j < size:
+                    lines.append(sum(1 << ((i + di * k) * size + j + dj * k) for k in range(win_length)))
+    return tuple(lines)
+
+
+def _symmetries(size):
+    # cell permutations for the 4 rotations and their mirror images
+    perms = []
+    for mirror in (False, True):
+        for turns in range(4):
+            perm = []
+            for index in range(size * size):
+                i, j = divmod(index, size)
+                if mirror:
+                    j = size - 1 - j
+                for _ in range(turns):
+                    i, j = j, size - 1 - i
+                perm.append(i * size + j)
+            perms.append(tuple(perm))
+    return perms
+
+
+def _permute(mask, perm):
+    result = 0
+    while mask:
+        low = mask & -mask
+        result |= 1 << perm[low.bit_length() - 1]
+        mask ^= low
+    return result
+
+
+class Geometry:
+    # Everything about an N x N, K-in-a-row board that does not depend on the pieces on it.
+    def __init__(self, size, win_length):
+        self.size = size
+        self.win_length = win_length
+        self.cells = size * size
+        self.full_mask = (1 << self.cells) - 1
+        self.lines = _line_masks(size, win_length)
+        # lines through each cell, so a win only has to be looked for around the last move
+        self.cell_lines = tuple(tuple(line for line in self.lines if line >> index & 1)
+                                for index in range(self.cells))
+        self.neighbours = tuple(
+            sum(1 << (ni * size + nj)
+                for ni in range(max(0, i - 1), min(size, i + 2))
+                for nj in range(max(0, j - 1), min(size, j + 2)))
+            for i, j in (divmod(index, size) for index in range(self.cells)))
+        centre = (size - 1) / 2
+        self.centre_order = tuple(sorted(range(self.cells),
+                                         key=lambda index: abs(index // size - centre) + abs(index % size - centre)))
+        self.symmetries = _symmetries(size)
+        self.inverse_symmetries = [tuple(perm.index(index) for index in range(self.cells))
+                                   for perm in self.symmetries]
+        # permuted[s][mask] is mask moved through symmetry s; only tabulated for small boards
+        self.permuted = None
+        if self.cells <= 9:
+            self.permuted = [[_permute(mask, perm) for mask in range(self.full_mask + 1)]
+                             for perm in self.symmetries]
+        # heuristic weight of a line holding n pieces of one side and none of the other
+        self.line_weights = tuple(0 if n == 0 else 10 ** n for n in range(win_length + 1))
+
+    def canonical_key(self, me_mask, opponent_mask, is_max):
+        # smallest encoding over the 8 board symmetries, plus the symmetry that produced it
+        best_key = None
+        best_symmetry = 0
+        for symmetry, perm in enumerate(self.symmetries):
+            if self.permuted:
+                table = self.permuted[symmetry]
+                key = table[me_mask] << self.cells | table[opponent_mask]
+            else:
+                key = _permute(me_mask, perm) << self.cells | _permute(opponent_mask, perm)
+            if best_key is None or key < best_key:
+                best_key = key
+                best_symmetry = symmetry
+        return best_key << 1 | is_max, best_symmetry
+
+
+@lru_cache(maxsize=None)
+def geometry(size, win_length):
+    return Geometry(size, win_length)
+
+
+class Board:
+    # Each side is an integer bitmask, bit (i * size + j) set when the side owns cell (i, j).
+    def __init__(self, size=SIZE, win_length=None):
+        self.size = size
+        self.win_length = win_length or size
+        self.geometry = geometry(self.size, self.win_length)
+        self.masks = {'X': 0, 'O': 0}
+
+    def copy(self):
+        board = Board(self.size, self.win_length)
+        board.masks = dict(self.masks)
+        return board
+
+    def clear(self):
+        self.masks = {'X': 0, 'O': 0}
+
+    def get(self, i, j):
+        bit = 1 << (i * self.size + j)
+        if self.masks['X'] & bit:
+            return 'X'
+        if self.masks['O'] & bit:
+            return 'O'
+        return ''
+
+    def is_empty(self, i, j):
+        return not (self.masks['X'] | self.masks['O']) & (1 << (i * self.size + j))
+
+    def toggle(self, index, symbol):
+        # XOR both places and removes a piece, so the same call undoes a move
+        self.masks[symbol] ^= 1 << index
+
+    def place(self, i, j, symbol):
+        self.toggle(i * self.size + j, symbol)
+
+    def undo(self, i, j, symbol):
+        self.toggle(i * self.size + j, symbol)
+
+    def empty_indices(self):
+        free = ~(self.masks['X'] | self.masks['O']) & self.geometry.full_mask
+        return [index for index in range(self.geometry.cells) if free >> index & 1]
+
+    def empty_cells(self):
+        return [divmod(index, self.size) for index in self.empty_indices()]
+
+    def candidate_mask(self):
+        # free cells worth considering: all of them on small boards, otherwise those next to a piece
+        geo = self.geometry
+        occupied = self.masks['X'] | self.masks['O']
+        free = ~occupied & geo.full_mask
+        if geo.cells > FULL_WIDTH_CELLS and occupied:
+            near = 0
+            mask = occupied
+            while mask:
+                low = mask & -mask
+                near |= geo.neighbours[low.bit_length() - 1]
+                mask ^= low
+            free &= near
+        return free
+
+    def candidate_indices(self):
+        free = self.candidate_mask()
+        return [index for index in self.geometry.centre_order if free >> index & 1]
+
+    def is_win(self, symbol):
+        mask = self.masks[symbol]
+        for line in self.geometry.lines:
+            if mask & line == line:
+                return True
+        return False
+
+    def wins_at(self, index, symbol):
+        mask = self.masks[symbol]
+        for line in self.geometry.cell_lines[index]:
+            if mask & line == line:
+                return True
+        return False
+
+    def is_full(self):
+        return self.masks['X'] | self.masks['O'] == self.geometry.full_mask
+
+    def winning_line(self):
+        for symbol in ('X', 'O'):
+            mask = self.masks[symbol]
+            for line in self.geometry.lines:
+                if mask & line == line:
+                    return [divmod(index, self.size) for index in range(self.geometry.cells) if line >> index & 1]
+        return None
+
+
+class TranspositionTable:
+    # Search results keyed by position, evicted least recently used first.
+    # Keys are relative to the searching side, so entries stay valid across moves and games.
+    def __init__(self, max_entries=50000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def store(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+def minimax(board, me, opponent, is_max, alpha, beta, table=None, root=True, cancel=None, stats=None):
+    # exact full-depth search; only practical on the classic 3x3 board.
+    # A cancelled search unwinds mid-move, so pass a copy of the board along with cancel.
+    if cancel is not None:
+        cancel.check()
+    if stats is not None:
+        stats.nodes += 1
+        if root:
+            stats.root_pieces = bin(board.masks[me] | board.masks[opponent]).count('1')
+    if board.is_win(me):
+        return 1, None
+    if board.is_win(opponent):
+        return -1, None
+    if board.is_full():
+        return 0, None
+
+    geo = board.geometry
+    if table is not None:
+        key, symmetry = geo.canonical_key(board.masks[me], board.masks[opponent], is_max)
+        entry = table.get(key)
+        if stats is not None:
+            stats.tt_probes += 1
+            stats.tt_hits += entry is not None
+        if entry is not None:
+            value, flag, move = entry
+            if move is not None:
+                move = divmod(geo.inverse_symmetries[symmetry][move], board.size)
+            if flag == EXACT:
+                return value, move
+            # a bound can leave the root with a value but no proven move, so only narrow below it
+            if not root:
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if beta <= alpha:
+                    return value, move
+
+    # classify against the narrowed window: only a value strictly inside it proves best_index
+    alpha_orig, beta_orig = alpha, beta
+    best_index = None
+    searched = 0
+    if is_max:
+        best_eval = -float('inf')
+        for index in board.empty_indices():
+            board.toggle(index, me)
+            eval, _ = minimax(board, me, opponent, False, alpha, beta, table, False, cancel, stats)
+            board.toggle(index, me)
+            searched += 1
+            if eval > best_eval:
+                best_eval = eval
+                best_index = index
+            alpha = max(alpha, eval)
+            if beta <= alpha:
+                break
+    else:
+        best_eval = float('inf')
+        for index in board.empty_indices():
+            board.toggle(index, opponent)
+            eval, _ = minimax(board, me, opponent, True, alpha, beta, table, False, cancel, stats)
+            board.toggle(index, opponent)
+            searched += 1
+            if eval < best_eval:
+                best_eval = eval
+                best_index = index
+            beta = min(beta, eval)
+            if beta <= alpha:
+                break
+
+    if stats is not None:
+        stats.interior += 1
+        stats.children += searched
+        if beta <= alpha:
+            stats.cutoff(bin(board.masks[me] | board.masks[opponent]).count('1') - stats.root_pieces)
+
+    if table is not None:
+        if best_eval <= alpha_orig:
+            flag = UPPER
+        elif best_eval >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        table.store(key, (best_eval, flag, geo.symmetries[symmetry][best_index]))
+    return best_eval, divmod(best_index, board.size)
+
+
+def evaluate(board, side, other):
+    # sum over lines still open to one side, weighted by how many pieces it already has there
+    geo = board.geometry
+    weights = geo.line_weights
+    mine = board.masks[side]
+    theirs = board.masks[other]
+    score = 0
+    for line in geo.lines:
+        a = mine & line
+        b = theirs & line
+        if a and not b:
+            score += weights[bin(a).count('1')]
+        elif b and not a:
+            score -= weights[bin(b).count('1')]
+    return score
+
+
+class _Timeout(Exception):
+    pass
+
+
+class _SearchContext:
+    def __init__(self, board, deadline, table, cancel, stats):
+        self.board = board
+        self.deadline = deadline
+        self.table = table
+        self.cancel = cancel
+        self.stats = stats
+        self.nodes = 0
+        self.history = [0] * board.geometry.cells
+
+    def candidate_moves(self, tt_move):
+        moves = self.board.candidate_indices()
+        history = self.history
+        moves.sort(key=lambda index: -history[index])
+        if tt_move is not None and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves
+
+
+def _negamax(ctx, side, other, depth, alpha, beta, ply):
+    ctx.nodes += 1
+    if ctx.nodes & 1023 == 0:
+        if ctx.cancel is not None:
+            ctx.cancel.check()
+        if time.perf_counter() > ctx.deadline:
+            raise _Timeout()
+
+    board = ctx.board
+    key = (board.masks[side], board.masks[other])
+    entry = ctx.table.get(key)
+    stats = ctx.stats
+    if stats is not None:
+        stats.tt_probes += 1
+        stats.tt_hits += entry is not None
+    tt_move = None
+    if entry is not None:
+        entry_depth, value, flag, tt_move = entry
+        value = _score_from_table(value, ply, board.geometry.cells)
+        # at the root the move must come from this search, so the entry only orders moves there
+        if ply > 0 and entry_depth >= depth:
+            if flag == EXACT:
+                return value, tt_move
+            if flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if beta <= alpha:
+                return value, tt_move
+
+    if depth == 0:
+        return evaluate(board, side, other), None
+
+    alpha_orig = alpha
+    best_score = -float('inf')
+    best_index = None
+    searched = 0
+    for index in ctx.candidate_moves(tt_move):
+        searched += 1
+        board.toggle(index, side)
+        if board.wins_at(index, side):
+            score = WIN_SCORE - ply
+        elif board.is_full():
+            score = 0
+        else:
+            score = -_negamax(ctx, other, side, depth - 1, -beta, -alpha, ply + 1)[0]
+        board.toggle(index, side)
+        if score > best_score:
+            best_score = score
+            best_index = index
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            ctx.history[index] += depth * depth
+            if stats is not None:
+                stats.cutoff(ply)
+            break
+    if stats is not None:
+        stats.interior += 1
+        stats.children += searched
+
+    if best_score <= alpha_orig:
+        flag = UPPER
+    elif best_score >= beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    ctx.table.store(key, (depth, _score_to_table(best_score, ply, board.geometry.cells), flag, best_index))
+    return best_score, best_index
+
+
+def _score_to_table(score, ply, cells):
+    # Win scores count plies from the root of the search, but the table outlives it and a
+    # position recurs at other plies, so they are stored counted from the position itself.
+    if score >= WIN_SCORE - cells:
+        return score + ply
+    if score <= cells - WIN_SCORE:
+        return score - ply
+    return score
+
+
+def _score_from_table(score, ply, cells):
+    if score >= WIN_SCORE - cells:
+        return score - ply
+    if score <= cells - WIN_SCORE:
+        return score + ply
+    return score
+
+
+def search(board, me, opponent, time_limit=1.0, max_depth=None, table=None, cancel=None, stats=None):
+    # iterative-deepening alpha-beta for boards too large for full-depth minimax;
+    # returns the best move of the deepest iteration that finished inside time_limit
+    empties = board.empty_indices()
+    if not empties:
+        return None
+    if table is None:
+        table = TranspositionTable()
+    # a timeout unwinds mid-move, so search a copy rather than the caller's board
+    ctx = _SearchContext(board.copy(), time.perf_counter() + time_limit, table, cancel, stats)
+    best_index = ctx.candidate_moves(None)[0]
+    max_depth = min(max_depth or len(empties), len(empties))
+    try:
+        for depth in range(1, max_depth + 1):
+            try:
+                score, index = _negamax(ctx, me, opponent, depth, -float('inf'), float('inf'), 0)
+            except _Timeout:
+                break
+            if index is not None:
+                best_index = index
+            if stats is not None:
+                stats.depth = max(stats.depth, depth)
+            if abs(score) >= WIN_SCORE - board.geometry.cells:
+                break  # forced result found, deeper iterations cannot change it
+    finally:
+        if stats is not None:
+            stats.nodes += ctx.nodes
+    return divmod(best_index, board.size)
@@ -0,0 +1,166 @@
+import math
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+
+from tictactoe_engine import Board, SearchCancelled
+
+
+class _Node:
+    __slots__ = ('move', 'parent', 'children', 'untried', 'visits', 'wins', 'mover')
+
+    def __init__(self, move, parent, mover, untried):
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0  # from the point of view of mover, the side that played self.move
+        self.mover = mover
+
+    def select_child(self, exploration):
+        log_visits = math.log(self.visits)
+        return max(self.children,
+                   key=lambda child: child.wins / child.visits
+                   + exploration * math.sqrt(log_visits / child.visits))
+
+
+def _rollout(board, side, other, rng):
+    # play random moves to the end; returns the winning symbol or None for a draw
+    free = board.empty_indices()
+    rng.shuffle(free)
+    for index in free:
+        board.toggle(index, side)
+        if board.wins_at(index, side):
+            return side
+        side, other = other, side
+    return None
+
+
+def run_tree(size, win_length, masks, me, opponent, iterations, time_limit, exploration, seed, cancel=None):
+    # Grows one UCT tree from the given position and returns {move index: (visits, wins)} for
+    # the root children, plus the number of iterations run. Module level so that ProcessPoolExecutor workers can run it;
+    # cancel only works in-process, pool workers are stopped by discarding their futures.
+    rng = random.Random(seed)
+    board = Board(size, win_length)
+    board.masks = dict(masks)
+    start_masks = dict(masks)
+    root = _Node(None, None, opponent, board.candidate_indices())
+    deadline = time.perf_counter() + time_limit if time_limit else None
+
+    completed = 0
+    for iteration in range(iterations):
+        if iteration & 63 == 0:
+            if cancel is not None:
+                cancel.check()
+            if deadline and time.perf_counter() > deadline:
+                break
+        completed += 1
+        node = root
+        side, other = me, opponent
+        winner = None
+        finished = False
+
+        # selection
+        while not node.untried and node.children:
+            node = node.select_child(exploration)
+            board.toggle(node.move, side)
+            side, other = other, side
+
+        # expansion
+        if node.untried:
+            index = node.untried.pop(rng.randrange(len(node.untried)))
+            board.toggle(index, side)
+            if board.wins_at(index, side):
+                winner, finished = side, True
+                untried = []
+            elif board.is_full():
+                finished = True
+                untried = []
+            else:
+                untried = board.candidate_indices()
+            child = _Node(index, node, side, untried)
+            node.children.append(child)
+            node = child
+            side, other = other, side
+        elif not node.children:
+            # terminal node reached again through selection
+            finished = True
+            last = node.move
+            if last is not None and board.wins_at(last, node.mover):
+                winner = node.mover
+
+        # simulation
+        if not finished:
+            winner = _rollout(board, side, other, rng)
+
+        # backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.wins += 0.5
+            elif winner == node.mover:
+                node.wins += 1
+            node = node.parent
+        board.masks = dict(start_masks)
+
+    return {child.move: (child.visits, child.wins) for child in root.children}, completed
+
+
+class MCTSPlayer:
+    # Monte Carlo Tree Search with UCT selection. Each worker process grows an independent tree
+    # from the same position (root parallelism) and the root visit counts are merged.
+    def __init__(self, iterations=20000, time_limit=1.0, workers=None, exploration=1.4):
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.workers = workers or os.cpu_count() or 1
+        self.exploration = exploration
+        self._executor = None
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def choose_move(self, board, me, opponent, cancel=None, stats=None):
+        moves = board.candidate_indices()
+        if not moves:
+            return None
+        # a move that wins on the spot needs no statistics
+        for index in moves:
+            board.toggle(index, me)
+            won = board.wins_at(index, me)
+            board.toggle(index, me)
+            if won:
+                return divmod(index, board.size)
+
+        per_worker = max(1, math.ceil(self.iterations / self.workers))
+        args = (board.size, board.win_length, board.masks, me, opponent,
+                per_worker, self.time_limit, self.exploration)
+        if self.workers <= 1:
+            results = [run_tree(*args, random.getrandbits(32), cancel)]
+        else:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            futures = [self._executor.submit(run_tree, *args, random.getrandbits(32))
+                       for _ in range(self.workers)]
+            pending = futures
+            while pending:
+                if cancel is not None and cancel.cancelled:
+                    # running trees cannot be interrupted; drop the pool so the next search
+                    # does not queue behind them, they exit once their time limit is up
+                    self.close()
+                    raise SearchCancelled()
+                _, pending = wait(pending, timeout=0.05, return_when=FIRST_EXCEPTION)
+            results = [future.result() for future in futures]
+
+        visits = defaultdict(int)
+        for children, completed in results:
+            for index, (count, _) in children.items():
+                visits[index] += count
+            if stats is not None:
+                stats.nodes += completed
+        best = max(visits, key=visits.get)
+        return divmod(best, board.size)
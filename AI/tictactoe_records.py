@@ -0,0 +1,118 @@
+import os
+import struct
+import time
+
+LOG_PATH = os.path.join(os.path.expanduser('~'), '.tictactoe', 'games.bin')
+MAGIC = b'TTR1'
+
+DIFFICULTIES = ['Easy', 'Medium', 'Hard', 'MCTS']
+RESULTS = ['player', 'ai', 'draw']
+
+# started, duration, size, win_length, difficulty, result, player symbol, move count
+_HEADER = struct.Struct('<dfBBBBcH')
+# cell index and think time in milliseconds; symbols alternate from X so they are not stored
+_MOVE = struct.Struct('<HH')
+
+
+class GameRecord:
+    def __init__(self, moves, result, difficulty, player_symbol='X', size=3, win_length=3,
+                 started=None, duration=0.0, move_times=None):
+        self.moves = moves  # [(symbol, i, j), ...] in play order
+        self.result = result
+        self.difficulty = difficulty
+        self.player_symbol = player_symbol
+        self.size = size
+        self.win_length = win_length
+        self.started = started if started is not None else time.time()
+        self.duration = duration
+        self.move_times = move_times or [0.0] * len(moves)  # seconds spent on each move
+
+    def pack(self):
+        data = [_HEADER.pack(self.started, self.duration, self.size, self.win_length,
+                             DIFFICULTIES.index(self.difficulty), RESULTS.index(self.result),
+                             self.player_symbol.encode(), len(self.moves))]
+        for (_, i, j), seconds in zip(self.moves, self.move_times):
+            data.append(_MOVE.pack(i * self.size + j, min(65535, int(seconds * 1000))))
+        return b''.join(data)
+
+    @classmethod
+    def unpack(cls, data, offset=0):
+        started, duration, size, win_length, difficulty, result, player, count = _HEADER.unpack_from(data, offset)
+        moves = []
+        move_times = []
+        offset += _HEADER.size
+        for number in range(count):
+            index, millis = _MOVE.unpack_from(data, offset + number * _MOVE.size)
+            i, j = divmod(index, size)
+            moves.append(('X' if number % 2 == 0 else 'O', i, j))
+            move_times.append(millis / 1000)
+        return cls(moves, RESULTS[result], DIFFICULTIES[difficulty], player.decode(), size, win_length,
+                   started, duration, move_times)
+
+
+class GameLog:
+    # Append-only file of packed GameRecords. Only record offsets are kept in memory;
+    # records are read back from disk when asked for.
+    def __init__(self, path=LOG_PATH):
+        self.path = path
+        self.offsets = None
+
+    def _load_index(self):
+        if self.offsets is not None:
+            return
+        self.offsets = []
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        if len(data) < len(MAGIC) and MAGIC.startswith(data):
+            # created but cut off before the magic was written; the next append starts over
+            with open(self.path, 'r+b') as f:
+                f.truncate(0)
+            return
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a game log")
+        offset = len(MAGIC)
+        while offset + _HEADER.size <= len(data):
+            count = _HEADER.unpack_from(data, offset)[-1]
+            end = offset + _HEADER.size + count * _MOVE.size
+            if end > len(data):
+                break
+            self.offsets.append(offset)
+            offset = end
+        if offset != len(data):
+            # drop a record that was cut short by a crash so later appends stay aligned
+            with open(self.path, 'r+b') as f:
+                f.truncate(offset)
+
+    def __len__(self):
+        self._load_index()
+        return len(self.offsets)
+
+    def append(self, record):
+        self._load_index()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'ab') as f:
+            if f.tell() == 0:
+                f.write(MAGIC)
+            self.offsets.append(f.tell())
+            f.write(record.pack())
+
+    def read(self, number):
+        # ValueError for a record that no longer reads back, e.g. the file changed underneath
+        self._load_index()
+        offset = self.offsets[number]
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            header = f.read(_HEADER.size)
+            try:
+                count = _HEADER.unpack(header)[-1]
+                return GameRecord.unpack(header + f.read(count * _MOVE.size))
+            except (struct.error, IndexError) as e:
+                raise ValueError(f"game {number} in {self.path} is damaged: {e}") from e
+
+    def __iter__(self):
+        for number in range(len(self)):
+            yield self.read(number)